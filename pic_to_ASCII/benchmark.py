@@ -0,0 +1,211 @@
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from PIL import Image
+
+from . import converter
+
+# name -> (width, height) of the synthetic source image
+IMAGE_SIZES = {
+    "small": (320, 240),
+    "medium": (1280, 960),
+    "large": (4000, 3000),
+}
+
+IMAGE_FORMATS = ("PNG", "JPEG", "GIF")
+
+BENCH_WIDTHS = (40, 70, 120)
+
+# Per-case timings, in milliseconds.
+STAGES = ("decode", "resize", "brightness", "html", "total")
+
+# NumPy is optional, so both renderers are benchmarked.
+IMPLEMENTATIONS = ("numpy", "python")
+
+
+def synthetic_image(size):
+    """
+    A deterministic RGB test image with smooth areas and fine detail: a
+    horizontal gradient, a Mandelbrot set and a radial gradient as its
+    three channels.
+    """
+    red = Image.linear_gradient("L").rotate(90).resize(size)
+    green = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 100)
+    blue = Image.radial_gradient("L").resize(size)
+    return Image.merge("RGB", (red, green, blue))
+
+
+def encode(img, format):
+    buffer = io.BytesIO()
+    img.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@contextmanager
+def _implementation(impl):
+    saved = converter.np
+    if impl == "python":
+        converter.np = None
+    try:
+        yield
+    finally:
+        converter.np = saved
+
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3), result
+
+
+def _convert(data, width):
+    # Not convert_image_to_ascii(): it turns failures into a short error
+    # paragraph, which would benchmark as a fast, small conversion.
+    return converter.render_ascii(converter.load_base_image(io.BytesIO(data)), width)
+
+
+def _peak_rss_kb():
+    """
+    This process's peak resident memory in KB. Linux's VmHWM starts afresh
+    in a new program, unlike getrusage(), which carries over the peak of
+    the process that forked it.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _measure_peak(width, impl):
+    """
+    Converts the image read from stdin once and prints how far that raised
+    the peak resident memory, in KB. Run in a fresh process per case by
+    peak_memory_kb().
+    """
+    with _implementation(impl):
+        data = sys.stdin.buffer.read()
+        before = _peak_rss_kb()
+        _convert(data, width)
+        print(_peak_rss_kb() - before)
+
+
+def peak_memory_kb(data, width, impl):
+    """
+    Extra peak resident memory, in KB, of converting `data` in a new
+    Python process. Unlike tracemalloc this counts Pillow's and NumPy's
+    pixel buffers, which hold nearly all of it.
+    """
+    result = subprocess.run(
+        [sys.executable, "-m", __name__, str(width), impl],
+        input=data,
+        capture_output=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return int(result.stdout)
+
+
+def run_case(data, width, impl="numpy", repeat=5):
+    """
+    Times each stage of convert_image_to_ascii() on the encoded image
+    `data`, as the median of `repeat` runs:
+
+        decode      load_base_image(): decode and shrink to BASE_WIDTH
+        resize      resize_for_ascii() to `width` cells
+        brightness  mapping each cell to ASCII_CHARS (the text mode)
+        html        the colour HTML of the resized image
+        total       the whole conversion, end to end
+
+    Also records the output size and the peak memory of one full
+    conversion (see peak_memory_kb). `impl` picks the NumPy or pure-Python
+    renderer. A failing conversion raises.
+    """
+    if impl == "numpy" and converter.np is None:
+        raise ValueError("NumPy is not installed")
+
+    with _implementation(impl):
+        result = {}
+        result["decode"], base = _median_ms(
+            lambda: converter.load_base_image(io.BytesIO(data)), repeat
+        )
+        result["resize"], img = _median_ms(
+            lambda: converter.resize_for_ascii(base, width), repeat
+        )
+        result["brightness"], _ = _median_ms(lambda: converter._text_rows(img), repeat)
+        result["html"], _ = _median_ms(lambda: converter._colour_html(img), repeat)
+        result["total"], html = _median_ms(lambda: _convert(data, width), repeat)
+
+    return {
+        **{f"{stage}_ms": result[stage] for stage in STAGES},
+        "bytes": len(html.encode()),
+        "peak_kb": peak_memory_kb(data, width, impl),
+    }
+
+
+def run_suite(sizes=None, formats=None, widths=None, impls=None, repeat=5):
+    """
+    Yields one result per size, format, width and implementation (the
+    pure-Python one only when NumPy is missing, unless asked for).
+    """
+    if impls is None:
+        impls = IMPLEMENTATIONS if converter.np is not None else ("python",)
+    for size in sizes or IMAGE_SIZES:
+        img = synthetic_image(IMAGE_SIZES[size])
+        for format in formats or IMAGE_FORMATS:
+            data = encode(img, format)
+            for width in widths or BENCH_WIDTHS:
+                for impl in impls:
+                    yield {
+                        "case": f"{size}/{format}/{width}/{impl}",
+                        "size": size,
+                        "format": format,
+                        "width": width,
+                        "impl": impl,
+                        **run_case(data, width, impl, repeat),
+                    }
+
+
+def regressions(results, baseline, tolerance, min_delta_ms=0.5):
+    """
+    Compares results with a previous run's, case by case. Returns a message
+    for every stage that got more than `tolerance` (a fraction, e.g. 0.25)
+    slower, ignoring differences under `min_delta_ms` as noise, and for
+    output size or peak memory that grew by more than `tolerance`.
+    """
+    previous = {r["case"]: r for r in baseline}
+    messages = []
+    for result in results:
+        before = previous.get(result["case"])
+        if not before:
+            continue
+        for stage in STAGES:
+            key = f"{stage}_ms"
+            old, new = before.get(key), result[key]
+            if old is None:
+                continue
+            if new > old * (1 + tolerance) and new - old >= min_delta_ms:
+                messages.append(f"{result['case']} {stage}: {old}ms -> {new}ms")
+        for key in ("bytes", "peak_kb"):
+            old, new = before.get(key), result[key]
+            if old and new > old * (1 + tolerance):
+                messages.append(f"{result['case']} {key}: {old} -> {new}")
+    return messages
+
+
+if __name__ == "__main__":
+    _measure_peak(int(sys.argv[1]), sys.argv[2])
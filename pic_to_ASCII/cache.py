@@ -0,0 +1,268 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .converter import convert_upload, decode_upload
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the total size of its values, as
+    measured by `sizeof`. Values larger than the whole budget are not kept.
+    """
+
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "size": len(self._entries), "bytes": self._size}
+
+
+class DiskCache:
+    """
+    Text values stored one file per key under `directory`, shared by every
+    worker process. Files are written atomically. Once the directory grows
+    past `max_bytes`, the least recently used files (by mtime; reads touch
+    it) are deleted until it is back under 90% of the budget.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None  # Bytes on disk, counted on first write.
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, name[:2], f"{name}.html")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        data = value.encode("utf-8")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._prune()
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".html"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._files())
+
+    def _prune(self):
+        files = sorted(self._files())
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in files:
+            if size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= file_size
+        self._size = size
+
+
+class ResultCache:
+    """
+    Rendered ASCII art: an in-memory LRU in front of an optional DiskCache.
+    A disk hit is copied into memory.
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+
+
+def upload_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def result_key(digest, width, **options):
+    """
+    Cache key for one rendering of an upload: its content hash, the width
+    and every output option that changes the result.
+    """
+    parts = [digest, f"width={width}"]
+    parts += [f"{name}={options[name]}" for name in sorted(options)]
+    return ":".join(parts)
+
+
+def _image_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+result_cache = ResultCache(
+    LRUCache(settings.ASCII_CACHE_MAX_BYTES),
+    (
+        DiskCache(
+            os.path.join(settings.MEDIA_ROOT, "ascii_cache"),
+            settings.ASCII_CACHE_DISK_MAX_BYTES,
+        )
+        if settings.ASCII_CACHE_DISK
+        else None
+    ),
+)
+
+base_image_cache = LRUCache(settings.ASCII_BASE_CACHE_MAX_BYTES, sizeof=_image_bytes)
+
+
+def _run_inline(fn, *args):
+    return fn(*args)
+
+
+def convert_cached(data, width, color_levels=None, mode="html", run=_run_inline):
+    """
+    convert_image_to_ascii() for the bytes of an upload, memoized by
+    content. A repeat of the same image and options is served from
+    result_cache; the same image at another width, colour setting or output
+    mode skips decoding and starts from its cached base image. Errors, including
+    ImageTooLarge for uploads over the configured limits, propagate and are
+    never cached.
+
+    The conversion itself is `run(convert_upload, *args)`, e.g. the run
+    method of a ConversionPool; by default it happens in this thread.
+    """
+    digest = upload_digest(data)
+    key = _render_key(digest, width, color_levels, mode)
+    html = result_cache.get(key)
+    if html is not None:
+        return html
+
+    base = base_image_cache.get(digest)
+    html, decoded = run(
+        convert_upload,
+        data if base is None else None,
+        base,
+        width,
+        color_levels,
+        settings.ASCII_MAX_PIXELS,
+        settings.ASCII_DECODE_MAX_BYTES,
+        mode,
+    )
+    if decoded is not None:
+        base_image_cache.set(digest, decoded)
+    result_cache.set(key, html)
+    return html
+
+
+def _render_key(digest, width, color_levels, mode):
+    return result_key(digest, width, colors=color_levels or 0, mode=mode)
+
+
+def cached_result(data, width, color_levels=None, mode="html"):
+    """
+    The cached rendering of an upload with these options, or None.
+    """
+    return result_cache.get(_render_key(upload_digest(data), width, color_levels, mode))
+
+
+def cache_result(data, width, color_levels, mode, html):
+    """
+    Stores a rendering made outside convert_cached(), e.g. a streamed one.
+    """
+    result_cache.set(_render_key(upload_digest(data), width, color_levels, mode), html)
+
+
+def load_cached_base(data, run=_run_inline):
+    """
+    The base image of an upload, from base_image_cache or decoded by
+    `run(decode_upload, ...)` and cached. For renders that are streamed
+    rather than cached whole.
+    """
+    digest = upload_digest(data)
+    base = base_image_cache.get(digest)
+    if base is None:
+        base = run(
+            decode_upload,
+            data,
+            settings.ASCII_MAX_PIXELS,
+            settings.ASCII_DECODE_MAX_BYTES,
+        )
+        base_image_cache.set(digest, base)
+    return base
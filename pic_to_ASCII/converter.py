@@ -0,0 +1,502 @@
+import io
+from itertools import groupby, islice
+
+from PIL import Image, ImageSequence
+
+try:
+    import numpy as np
+except ImportError:  # The pure-Python path below is used instead.
+    np = None
+
+# Precomputed ASCII characters from darkest to lightest
+ASCII_CHARS = ["@", "#", "S", "%", "?", "*", "+", ";", ":", ",", "."]
+
+# Filler drawn in every colour cell; its colour matches the background.
+BLOCK = "█"
+
+# Allowed range for the per-channel colour levels of quantize_image().
+MIN_COLOR_LEVELS = 2
+MAX_COLOR_LEVELS = 64
+
+# Output modes of render_ascii(); the first is the default.
+#   html: inline-styled colour spans
+#   css:  a palette sent once as CSS classes, short class names per run
+#   text: monochrome plain text from ASCII_CHARS
+#   ansi: ASCII_CHARS in 24-bit colour for terminals
+OUTPUT_MODES = ("html", "css", "text", "ansi")
+
+# Colour levels per channel the "css" mode uses when none are requested,
+# keeping the palette to at most 8**3 classes.
+DEFAULT_PALETTE_LEVELS = 8
+
+# What separates the rows of each output mode.
+ROW_SEPARATORS = {"html": "<br>", "css": "<br>", "text": "\n", "ansi": "\n"}
+
+# Width uploads are reduced to by load_base_image(): twice the widest render,
+# so the final resize still averages several source pixels into each cell.
+BASE_WIDTH = 240
+
+
+# Bytes per pixel Pillow allocates for an image mode; everything else,
+# including RGB, is stored four bytes wide.
+_PIXEL_BYTES = {"1": 1, "L": 1, "P": 1, "I;16": 2}
+
+# Modes Image.reduce() cannot average (palette indices, bilevel, 16-bit).
+_UNREDUCIBLE_MODES = {"1", "P", "I;16"}
+
+
+class ImageTooLarge(ValueError):
+    """
+    An upload whose dimensions or decoding memory exceed the limits.
+    """
+
+
+def _reduce_factor(img):
+    if img.mode in _UNREDUCIBLE_MODES:
+        return 1
+    return max(1, img.width // BASE_WIDTH)
+
+
+def decode_peak_bytes(img):
+    """
+    Estimated peak memory of load_base_image() for an opened image: the
+    decoded pixels plus the RGB copy made after integer reduction.
+    """
+    decoded = img.width * img.height * _PIXEL_BYTES.get(img.mode, 4)
+    factor = _reduce_factor(img)
+    return decoded + (img.width // factor) * (img.height // factor) * 4
+
+
+def open_upload(image_file, max_pixels=None, max_decode_bytes=None):
+    """
+    Opens an upload without decoding it and asks the decoder to scale it
+    down as it decodes (JPEG only: 1/2, 1/4 or 1/8 via draft()). Raises
+    ImageTooLarge when the original exceeds `max_pixels` or decoding would
+    need more than `max_decode_bytes`.
+    """
+    try:
+        img = Image.open(image_file)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from e
+
+    if max_pixels is not None and img.width * img.height > max_pixels:
+        raise ImageTooLarge(
+            f"Image is {img.width}x{img.height}, over the {max_pixels} pixel limit"
+        )
+
+    if img.format == "JPEG" and img.width > BASE_WIDTH:
+        height = max(1, img.height * BASE_WIDTH // img.width)
+        img.draft("RGB", (BASE_WIDTH, height))
+
+    if max_decode_bytes is not None and decode_peak_bytes(img) > max_decode_bytes:
+        raise ImageTooLarge(
+            f"Decoding a {img.width}x{img.height} {img.format} image needs more "
+            f"than the {max_decode_bytes} byte budget"
+        )
+    return img
+
+
+def load_base_image(image_file, max_pixels=None, max_decode_bytes=None):
+    """
+    Decodes an upload into an RGB image at most BASE_WIDTH pixels wide.
+    Every render starts from this, so it can be cached per upload.
+
+    The image is shrunk as early as possible: in the JPEG decoder, then by
+    an integer factor with reduce() while still in its own mode, and only
+    then converted to RGB, so full-resolution RGB copies are never made.
+    """
+    return _shrink_to_base(open_upload(image_file, max_pixels, max_decode_bytes))
+
+
+def _shrink_to_base(img):
+    factor = _reduce_factor(img)
+    if factor >= 2:
+        img = img.reduce(factor)
+    img = img.convert("RGB")
+    if img.width > BASE_WIDTH:
+        height = max(1, round(img.height * BASE_WIDTH / img.width))
+        img = img.resize((BASE_WIDTH, height), Image.Resampling.BILINEAR)
+    return img
+
+
+def load_frames(image_file, max_pixels=None, max_decode_bytes=None, max_frames=None):
+    """
+    load_base_image() for every frame of a (possibly animated) upload.
+    Returns a list of (base image, frame duration in ms or None). Raises
+    ImageTooLarge for more than `max_frames` frames.
+    """
+    img = open_upload(image_file, max_pixels, max_decode_bytes)
+    count = getattr(img, "n_frames", 1)
+    if max_frames is not None and count > max_frames:
+        raise ImageTooLarge(f"Image has {count} frames, over the {max_frames} limit")
+    return [
+        (_shrink_to_base(frame), frame.info.get("duration"))
+        for frame in ImageSequence.Iterator(img)
+    ]
+
+
+def resize_for_ascii(img, width):
+    """
+    RGB copy of `img` `width` cells wide. Rows are squashed to 0.55 of the
+    width's scale because a character cell is taller than it is wide.
+    """
+    img = img.convert("RGB")
+    aspect_ratio = img.height / img.width
+    new_height = max(1, int(width * aspect_ratio * 0.55))
+    return img.resize((width, new_height), Image.Resampling.BILINEAR)
+
+
+def quantize_image(img, levels):
+    """
+    Snaps every channel of an RGB image to `levels` evenly spaced values
+    (the middle of each bin), so neighbouring cells of nearly the same
+    colour become identical and merge into one span.
+    """
+    step = 256 / levels
+    table = [min(255, int((value // step) * step + step / 2)) for value in range(256)]
+    return img.point(table * 3)
+
+
+def _row_runs_numpy(img):
+    pixels = np.asarray(img, dtype=np.uint32)
+    height, width = pixels.shape[:2]
+    colors = (pixels[:, :, 0] << 16) | (pixels[:, :, 1] << 8) | pixels[:, :, 2]
+
+    # A run starts at the first cell of every row and wherever the colour
+    # changes, so runs never cross rows.
+    starts = np.ones((height, width), dtype=bool)
+    starts[:, 1:] = colors[:, 1:] != colors[:, :-1]
+    run_starts = np.flatnonzero(starts)
+    run_lengths = np.diff(np.append(run_starts, height * width)).tolist()
+    run_colors = colors.ravel()[run_starts].tolist()
+
+    row_bounds = np.searchsorted(run_starts, np.arange(height + 1) * width).tolist()
+    for y in range(height):
+        start, end = row_bounds[y], row_bounds[y + 1]
+        yield zip(run_colors[start:end], run_lengths[start:end])
+
+
+def _row_runs_python(img):
+    pixels = list(img.getdata())
+    width_px = img.width
+    for start in range(0, len(pixels), width_px):
+        yield [
+            ((r << 16) | (g << 8) | b, sum(1 for _ in run))
+            for (r, g, b), run in groupby(pixels[start : start + width_px])
+        ]
+
+
+def _row_runs(img):
+    """
+    Per row of an RGB image, its runs of identical cells as
+    (0xRRGGBB colour, length) pairs.
+    """
+    if np is not None:
+        return _row_runs_numpy(img)
+    return _row_runs_python(img)
+
+
+def _html_rows(img):
+    blocks = [BLOCK * length for length in range(img.width + 1)]
+    for runs in _row_runs(img):
+        yield "".join(
+            f'<span style="background:#{color:06x};color:#{color:06x}">{blocks[length]}</span>'
+            for color, length in runs
+        )
+
+
+def _colour_html(img):
+    return "<br>".join(_html_rows(img))
+
+
+# Maps an 8-bit brightness to its ASCII_CHARS byte, for bytes.translate().
+_BRIGHTNESS_TABLE = bytes(
+    ord(ASCII_CHARS[int(value / 255 * (len(ASCII_CHARS) - 1))]) for value in range(256)
+)
+
+
+def _ascii_char(color):
+    r, g, b = color >> 16, (color >> 8) & 255, color & 255
+    return chr(_BRIGHTNESS_TABLE[(r * 299 + g * 587 + b * 114) // 1000])
+
+
+def _text_rows(img):
+    width = img.width
+    text = img.convert("L").tobytes().translate(_BRIGHTNESS_TABLE).decode("ascii")
+    return [text[i : i + width] for i in range(0, len(text), width)]
+
+
+def _plain_text(img):
+    return "\n".join(_text_rows(img))
+
+
+def _palette_rows(img, classes):
+    """
+    Palette-class rows of an RGB image. Every colour not yet in `classes`
+    (colour -> class name) is added to it, so one palette can be shared by
+    several images.
+    """
+    for runs in _row_runs(img):
+        pieces = []
+        for color, length in runs:
+            name = classes.get(color)
+            if name is None:
+                name = classes[color] = f"c{len(classes):x}"
+            pieces.append(f"<span class={name}>{BLOCK * length}</span>")
+        yield "".join(pieces)
+
+
+def _palette_style(classes):
+    return "<style>%s</style>" % "".join(
+        f".{name}{{background:#{color:06x};color:#{color:06x}}}"
+        for color, name in classes.items()
+    )
+
+
+def _palette_html(img):
+    classes = {}  # colour -> class name, in order of first use
+    rows = "<br>".join(_palette_rows(img, classes))
+    return _palette_style(classes) + rows
+
+
+def _ansi_rows(img):
+    for runs in _row_runs(img):
+        yield "".join(
+            f"\x1b[38;2;{color >> 16};{(color >> 8) & 255};{color & 255}m"
+            + _ascii_char(color) * length
+            for color, length in runs
+        ) + "\x1b[0m"
+
+
+def _ansi_text(img):
+    return "\n".join(_ansi_rows(img))
+
+
+def render_colour_html(img, width, color_levels=None):
+    """
+    Colour HTML for a base image from load_base_image(): one row per line,
+    adjacent cells of the same colour sharing one <span>. With
+    `color_levels` (levels per channel, see quantize_image) colours are
+    coarsened first so far more of them do.
+    """
+    # 1. REDUCE IMAGE SIZE FIRST (biggest CPU saver)
+    img = resize_for_ascii(img, width)
+    if color_levels:
+        img = quantize_image(img, color_levels)
+
+    # 2. Runs come from NumPy when available, with the same output either way
+    return _colour_html(img)
+
+
+def render_ascii(img, width, color_levels=None, mode="html"):
+    """
+    Renders a base image from load_base_image() in one of OUTPUT_MODES.
+    `color_levels` coarsens colours as in render_colour_html(); the "css"
+    mode always does, with DEFAULT_PALETTE_LEVELS unless told otherwise,
+    and the monochrome "text" mode ignores it.
+    """
+    if mode == "html":
+        return render_colour_html(img, width, color_levels)
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r}")
+
+    img = resize_for_ascii(img, width)
+    if mode == "text":
+        return _plain_text(img)
+    if mode == "css":
+        color_levels = color_levels or DEFAULT_PALETTE_LEVELS
+    if color_levels:
+        img = quantize_image(img, color_levels)
+    if mode == "css":
+        return _palette_html(img)
+    return _ansi_text(img)
+
+
+def decode_upload(data, max_pixels=None, max_decode_bytes=None):
+    """
+    load_base_image() for the bytes of an upload; a worker-process job.
+    """
+    return load_base_image(
+        io.BytesIO(data), max_pixels=max_pixels, max_decode_bytes=max_decode_bytes
+    )
+
+
+def convert_upload(
+    data,
+    base,
+    width,
+    color_levels=None,
+    max_pixels=None,
+    max_decode_bytes=None,
+    mode="html",
+):
+    """
+    One conversion job: renders `base` when given, otherwise decodes the
+    upload bytes `data` first. Returns (html, the newly decoded base image
+    or None). Takes and returns only picklable values and needs no Django
+    settings, so it can run in a worker process.
+    """
+    decoded = None
+    if base is None:
+        base = decoded = decode_upload(data, max_pixels, max_decode_bytes)
+    return render_ascii(base, width, color_levels, mode), decoded
+
+
+def iter_ascii_rows(img, width, color_levels=None, mode="html"):
+    """
+    render_ascii() one row at a time, for streaming: yields each row
+    without the ROW_SEPARATORS between them. In "css" mode each row that
+    uses new colours is preceded by a <style> defining just those classes.
+    """
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r}")
+
+    img = resize_for_ascii(img, width)
+    if mode == "text":
+        yield from _text_rows(img)
+        return
+    if mode == "css":
+        color_levels = color_levels or DEFAULT_PALETTE_LEVELS
+    if color_levels:
+        img = quantize_image(img, color_levels)
+
+    if mode == "html":
+        yield from _html_rows(img)
+    elif mode == "ansi":
+        yield from _ansi_rows(img)
+    else:
+        classes = {}
+        defined = 0
+        for row in _palette_rows(img, classes):
+            if len(classes) > defined:
+                new = dict(islice(classes.items(), defined, None))
+                defined = len(classes)
+                row = _palette_style(new) + row
+            yield row
+
+
+def render_frames(bases, width, color_levels=None, mode="html"):
+    """
+    Renders several base images at once, sharing the work between them.
+
+    Frames that are identical once resized are rendered only once. The
+    rest are stacked into one tall image, so quantization and run
+    detection are a single pass and, in "css" mode, every frame uses one
+    shared palette. Returns (the palette's <style> block, or "" outside
+    "css" mode; one entry per base: its rendering, or for a repeat the
+    index of the earlier identical frame).
+    """
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r}")
+    if mode == "css":
+        color_levels = color_levels or DEFAULT_PALETTE_LEVELS
+
+    outputs = []
+    unique = []  # (index in outputs, resized image)
+    first_seen = {}  # pixel bytes -> index in outputs
+    for base in bases:
+        img = resize_for_ascii(base, width)
+        key = (img.size, img.tobytes())
+        if key in first_seen:
+            outputs.append(first_seen[key])
+            continue
+        first_seen[key] = len(outputs)
+        unique.append((len(outputs), img))
+        outputs.append(None)
+    if not unique:
+        return "", outputs
+
+    sheet = Image.new("RGB", (width, sum(img.height for _, img in unique)))
+    top = 0
+    for _, img in unique:
+        sheet.paste(img, (0, top))
+        top += img.height
+    if color_levels and mode != "text":
+        sheet = quantize_image(sheet, color_levels)
+
+    classes = {}
+    rows = {
+        "html": _html_rows,
+        "css": lambda img: _palette_rows(img, classes),
+        "text": _text_rows,
+        "ansi": _ansi_rows,
+    }[mode](sheet)
+    rows = iter(rows)
+    separator = ROW_SEPARATORS[mode]
+    for index, img in unique:
+        outputs[index] = separator.join(islice(rows, img.height))
+    return (_palette_style(classes) if mode == "css" else ""), outputs
+
+
+def convert_batch(
+    uploads,
+    width,
+    color_levels=None,
+    mode="html",
+    max_pixels=None,
+    max_decode_bytes=None,
+    max_frames=None,
+):
+    """
+    One batch conversion job: every frame of every upload (a list of
+    bytes) rendered by render_frames(). Returns a JSON-ready bundle:
+
+        {"mode", "width", "style" (css mode only),
+         "frames": [{"file", "frame", "duration", "ascii" or "same_as"}],
+         "errors": [{"file", "error"}] (only for unreadable uploads)}
+
+    where "same_as" is the position in "frames" of an identical frame.
+    ImageTooLarge, including more than `max_frames` frames in all, fails
+    the whole batch. Like convert_upload() it can run in a worker process.
+    """
+    frames = []  # (file index, frame number, base image, duration)
+    errors = []
+    for file_index, data in enumerate(uploads):
+        remaining = None if max_frames is None else max_frames - len(frames)
+        try:
+            decoded = load_frames(
+                io.BytesIO(data), max_pixels, max_decode_bytes, remaining
+            )
+        except ImageTooLarge:
+            raise
+        except Exception as e:
+            errors.append({"file": file_index, "error": str(e)})
+            continue
+        frames += [
+            (file_index, number, base, duration)
+            for number, (base, duration) in enumerate(decoded)
+        ]
+
+    style, outputs = render_frames(
+        [base for _, _, base, _ in frames], width, color_levels, mode
+    )
+    bundle = {"mode": mode, "width": width, "frames": []}
+    if style:
+        bundle["style"] = style
+    for (file_index, number, _, duration), output in zip(frames, outputs):
+        entry = {"file": file_index, "frame": number}
+        if duration is not None:
+            entry["duration"] = duration
+        if isinstance(output, int):
+            entry["same_as"] = output
+        else:
+            entry["ascii"] = output
+        bundle["frames"].append(entry)
+    if errors:
+        bundle["errors"] = errors
+    return bundle
+
+
+def error_html(error):
+    return f"<p style='color:  red;'>Error: {str(error)}</p>"
+
+
+def convert_image_to_ascii(image_file, width=80, color_levels=None, mode="html"):
+    """
+    Optimized ASCII art converter for low-resource environments.
+    Failures are returned as an HTML error paragraph.
+    """
+    try:
+        return render_ascii(load_base_image(image_file), width, color_levels, mode)
+    except Exception as e:
+        return error_html(e)
@@ -0,0 +1,101 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pic_to_ASCII.benchmark import (
+    BENCH_WIDTHS,
+    IMAGE_FORMATS,
+    IMAGE_SIZES,
+    IMPLEMENTATIONS,
+    regressions,
+    run_suite,
+)
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",")]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the image-to-ASCII pipeline on synthetic images and report "
+        "per-stage timings, output size and peak memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            action="append",
+            choices=list(IMAGE_SIZES),
+            help="Source image size; repeat for several. Defaults to all.",
+        )
+        parser.add_argument(
+            "--format",
+            action="append",
+            choices=IMAGE_FORMATS,
+            help="Upload format; repeat for several. Defaults to all.",
+        )
+        parser.add_argument(
+            "--widths",
+            type=_int_list,
+            default=list(BENCH_WIDTHS),
+            help="Comma-separated output widths.",
+        )
+        parser.add_argument(
+            "--impl",
+            action="append",
+            choices=IMPLEMENTATIONS,
+            help="Renderer to time; repeat for both. Defaults to every available one.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per stage; the median counts."
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument(
+            "--baseline", help="Results file of an earlier run to compare against."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed slowdown or growth against the baseline, as a fraction.",
+        )
+        parser.add_argument(
+            "--min-delta",
+            type=float,
+            default=0.5,
+            help="Stage slowdowns below this many ms are treated as noise.",
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        self.stdout.write(
+            f"{'case':<28}{'decode':>9}{'resize':>9}{'bright':>9}{'html':>9}"
+            f"{'total':>9}{'bytes':>10}{'peak KB':>10}"
+        )
+        for result in run_suite(
+            options["size"],
+            options["format"],
+            options["widths"],
+            options["impl"],
+            options["repeat"],
+        ):
+            results.append(result)
+            self.stdout.write(
+                f"{result['case']:<28}{result['decode_ms']:>9}{result['resize_ms']:>9}"
+                f"{result['brightness_ms']:>9}{result['html_ms']:>9}"
+                f"{result['total_ms']:>9}{result['bytes']:>10}{result['peak_kb']:>10}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                worse = regressions(
+                    results, json.load(f), options["tolerance"], options["min_delta"]
+                )
+            if worse:
+                raise CommandError("ASCII pipeline regressed:\n" + "\n".join(worse))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
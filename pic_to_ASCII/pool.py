@@ -0,0 +1,153 @@
+import atexit
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+
+class PoolSaturated(Exception):
+    """
+    Every worker is busy and the queue is full; try again later.
+    """
+
+
+class ConversionTimeout(Exception):
+    """
+    A job ran longer than the pool's per-job timeout.
+    """
+
+
+def _on_alarm(signum, frame):
+    raise ConversionTimeout("Conversion took too long")
+
+
+def _call_with_alarm(timeout, fn, *args):
+    """
+    Runs fn(*args) in a worker process, interrupting it with
+    ConversionTimeout after `timeout` seconds where SIGALRM exists.
+    """
+    if not hasattr(signal, "setitimer"):
+        return fn(*args)
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class ConversionPool:
+    """
+    Runs CPU-heavy jobs in `workers` separate processes so they never hold
+    up the request threads serving other endpoints.
+
+    At most `workers + max_queued` jobs are accepted at once; beyond that
+    run() raises PoolSaturated straight away instead of queueing. A job
+    that runs for longer than `timeout` seconds is interrupted and raises
+    ConversionTimeout. With `workers` set to 0 jobs run inline, without a
+    queue limit or timeout.
+
+    Workers are spawned on first use rather than forked, so they do not
+    inherit this process's threads or open connections.
+    """
+
+    def __init__(self, workers, max_queued, timeout):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, workers + max_queued))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def run(self, fn, *args):
+        """
+        Returns fn(*args) computed in a worker. `fn` and the arguments must
+        be picklable, so `fn` has to be a module-level function.
+        """
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated("All conversion workers are busy")
+
+        try:
+            future = self._get_executor().submit(
+                _call_with_alarm, self.timeout, fn, *args
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        # Jobs ahead in the queue may each take up to `timeout` as well.
+        deadline = self.timeout * (1 + self.max_queued / self.workers) + 1
+        try:
+            return future.result(timeout=deadline)
+        except FuturesTimeoutError:
+            future.cancel()
+            raise ConversionTimeout("Conversion took too long")
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start afresh next time.
+            self._reset()
+            raise
+
+    def reserve(self):
+        """
+        Takes a slot for CPU work done outside the workers, such as a render
+        streamed from the request thread, so it counts against the same
+        limit. Returns a function that gives the slot back (only the first
+        call does anything). Raises PoolSaturated like run().
+        """
+        if self.workers <= 0:
+            return lambda: None
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated("All conversion workers are busy")
+        once = threading.Lock()
+
+        def release():
+            if once.acquire(blocking=False):
+                self._slots.release()
+
+        return release
+
+    def shutdown(self):
+        self._reset()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _reset(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide ConversionPool configured from settings.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConversionPool(
+                workers=settings.ASCII_POOL_WORKERS,
+                max_queued=settings.ASCII_POOL_QUEUE_SIZE,
+                timeout=settings.ASCII_JOB_TIMEOUT,
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
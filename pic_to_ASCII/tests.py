@@ -1,3 +1,569 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from . import benchmark, cache, converter, views
+from .cache import DiskCache, LRUCache, ResultCache, convert_cached
+from .converter import (
+    ImageTooLarge,
+    convert_batch,
+    convert_image_to_ascii,
+    iter_ascii_rows,
+    load_base_image,
+    open_upload,
+)
+from .pool import ConversionPool, ConversionTimeout, PoolSaturated
+
+
+def image_file(img, format="PNG"):
+    buffer = io.BytesIO()
+    img.save(buffer, format=format)
+    buffer.seek(0)
+    return buffer
+
+
+def two_tone_image(width=40, height=20):
+    img = Image.new("RGB", (width, height), (200, 0, 0))
+    img.paste((0, 0, 200), (width // 2, 0, width, height))
+    return img
+
+
+def animated_gif(*frames, duration=100):
+    buffer = io.BytesIO()
+    frames[0].save(
+        buffer,
+        format="GIF",
+        save_all=True,
+        append_images=frames[1:],
+        duration=duration,
+        loop=0,
+    )
+    buffer.seek(0)
+    return buffer
+
+
+class ConvertImageToAsciiTests(TestCase):
+    def test_same_colour_cells_share_one_span(self):
+        html = convert_image_to_ascii(image_file(two_tone_image()), width=40)
+
+        rows = html.split("<br>")
+        self.assertEqual(len(rows), 11)  # 40 * 0.5 * 0.55
+        self.assertEqual(rows[0].count("<span"), 2)
+        self.assertIn('<span style="background:#c80000;color:#c80000">', rows[0])
+        self.assertEqual(rows[0].count(converter.BLOCK), 40)
+
+    def test_python_fallback_merges_runs_too(self):
+        with mock.patch.object(converter, "np", None):
+            html = convert_image_to_ascii(image_file(two_tone_image()), width=40)
+
+        rows = html.split("<br>")
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[0].count("<span"), 2)
+
+    def test_quantization_merges_near_colours(self):
+        img = Image.new("RGB", (40, 20))
+        img.putdata([(100 + x % 3, 50, 50) for _ in range(20) for x in range(40)])
+
+        exact = convert_image_to_ascii(image_file(img), width=40)
+        quantized = convert_image_to_ascii(image_file(img), width=40, color_levels=8)
+
+        self.assertGreater(exact.count("<span"), quantized.count("<span"))
+        self.assertEqual(quantized.split("<br>")[0].count("<span"), 1)
+
+    def test_css_mode_sends_each_colour_once(self):
+        html = convert_image_to_ascii(image_file(two_tone_image()), 40, mode="css")
+
+        style, body = html.split("</style>")
+        self.assertEqual(style.count("{background:"), 2)
+        # Quantized to DEFAULT_PALETTE_LEVELS: 200 -> 208, 0 -> 16.
+        self.assertIn(".c0{background:#d01010;color:#d01010}", style)
+        self.assertEqual(body.split("<br>")[0].count("<span class=c"), 2)
+        self.assertNotIn("style=", body)
+
+    def test_text_mode_uses_ascii_chars(self):
+        img = Image.new("RGB", (40, 20), (0, 0, 0))
+        img.paste((255, 255, 255), (20, 0, 40, 20))
+
+        text = convert_image_to_ascii(image_file(img), width=40, mode="text")
+
+        rows = text.split("\n")
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[0], "@" * 20 + "." * 20)
+
+    def test_ansi_mode_colours_each_run(self):
+        text = convert_image_to_ascii(image_file(two_tone_image()), 40, mode="ansi")
+
+        rows = text.split("\n")
+        self.assertEqual(len(rows), 11)
+        self.assertTrue(rows[0].startswith("\x1b[38;2;200;0;0m"))
+        self.assertTrue(rows[0].endswith("\x1b[0m"))
+        self.assertEqual(rows[0].count("\x1b[38;2;"), 2)
+
+    def test_compact_modes_match_without_numpy(self):
+        for mode in ("css", "text", "ansi"):
+            with self.subTest(mode=mode):
+                expected = convert_image_to_ascii(
+                    image_file(two_tone_image()), 40, mode=mode
+                )
+                with mock.patch.object(converter, "np", None):
+                    actual = convert_image_to_ascii(
+                        image_file(two_tone_image()), 40, mode=mode
+                    )
+                self.assertEqual(actual, expected)
+
+    def test_unreadable_upload_is_reported(self):
+        html = convert_image_to_ascii(io.BytesIO(b"not an image"), width=40)
+        self.assertIn("Error:", html)
+
+
+class IndexViewTests(TestCase):
+    def setUp(self):
+        cache.result_cache.clear()
+        cache.base_image_cache.clear()
+
+    def test_htmx_post_returns_pre_block(self):
+        upload = image_file(two_tone_image())
+        upload.name = "tone.png"
+
+        response = self.client.post(
+            "/pic_to_ASCII/",
+            {"image": upload, "width": 40, "colors": 8},
+            HTTP_HX_REQUEST="true",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "<pre")
+        self.assertContains(response, f">{converter.BLOCK * 20}</span>")
+
+    def post_image(self, img):
+        upload = image_file(img)
+        upload.name = "upload.png"
+        return self.client.post("/pic_to_ASCII/", {"image": upload, "width": 40})
+
+    @override_settings(ASCII_MAX_UPLOAD_BYTES=100)
+    def test_oversized_upload_is_413(self):
+        response = self.post_image(two_tone_image(400, 400))
+        self.assertEqual(response.status_code, 413)
+
+    @override_settings(ASCII_MAX_PIXELS=1000)
+    def test_too_many_pixels_is_413(self):
+        response = self.post_image(two_tone_image(100, 100))
+        self.assertEqual(response.status_code, 413)
+        self.assertIn(b"pixel limit", response.content)
+
+    def test_text_mode_is_plain_text(self):
+        upload = image_file(two_tone_image())
+        upload.name = "tone.png"
+
+        response = self.client.post(
+            "/pic_to_ASCII/", {"image": upload, "width": 40, "mode": "text"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        self.assertEqual(len(response.content.splitlines()), 11)
+
+    def test_unknown_mode_is_rejected(self):
+        upload = image_file(two_tone_image())
+        upload.name = "tone.png"
+
+        response = self.client.post("/pic_to_ASCII/", {"image": upload, "mode": "svg"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_busy_pool_is_503_with_retry_after(self):
+        pool = mock.Mock()
+        pool.run.side_effect = PoolSaturated()
+        with mock.patch.object(views, "get_pool", return_value=pool):
+            response = self.post_image(two_tone_image())
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+
+    def test_missing_image_is_rejected(self):
+        response = self.client.post("/pic_to_ASCII/")
+        self.assertEqual(response.status_code, 400)
+
+
+class ConversionCacheTests(TestCase):
+    def setUp(self):
+        cache.result_cache.clear()
+        cache.base_image_cache.clear()
+        self.data = image_file(two_tone_image()).getvalue()
+
+    def test_repeat_upload_is_served_from_cache(self):
+        with mock.patch.object(
+            converter, "render_colour_html", wraps=converter.render_colour_html
+        ) as render:
+            first = convert_cached(self.data, 40)
+            second = convert_cached(self.data, 40)
+
+        self.assertEqual(first, second)
+        self.assertEqual(render.call_count, 1)
+
+    def test_new_width_reuses_the_decoded_image(self):
+        with mock.patch.object(
+            converter, "load_base_image", wraps=converter.load_base_image
+        ) as load:
+            narrow = convert_cached(self.data, 40)
+            wide = convert_cached(self.data, 60)
+            convert_cached(self.data, 60, color_levels=4)
+
+        self.assertEqual(load.call_count, 1)
+        self.assertNotEqual(narrow, wide)
+        self.assertEqual(cache.result_cache.memory.stats()["size"], 3)
+
+    def test_errors_are_not_cached(self):
+        with self.assertRaises(Exception):
+            convert_cached(b"not an image", 40)
+        self.assertEqual(cache.result_cache.memory.stats()["size"], 0)
+
+    def test_lru_is_bounded_by_size(self):
+        lru = LRUCache(max_bytes=10)
+        lru.set("a", "x" * 4)
+        lru.set("b", "x" * 4)
+        lru.get("a")
+        lru.set("c", "x" * 4)
+
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("a"), "x" * 4)
+        self.assertEqual(lru.stats()["evictions"], 1)
+
+    def test_disk_tier_survives_memory_eviction_and_is_pruned(self):
+        with tempfile.TemporaryDirectory() as directory:
+            disk = DiskCache(directory, max_bytes=25)
+            results = ResultCache(LRUCache(max_bytes=10), disk)
+            results.set("first", "a" * 10)
+            results.set("second", "b" * 10)
+
+            self.assertEqual(results.get("first"), "a" * 10)
+
+            os.utime(disk._path("second"), (0, 0))
+            results.set("third", "c" * 10)
+            self.assertIsNone(disk.get("second"))
+            self.assertEqual(disk.get("third"), "c" * 10)
+
+
+class DecodingLimitTests(TestCase):
+    def test_large_jpeg_is_downscaled_by_the_decoder(self):
+        upload = image_file(Image.new("RGB", (4000, 3000), (10, 20, 30)), "JPEG")
+
+        img = open_upload(upload)
+
+        self.assertEqual(img.size, (500, 375))  # 1/8 scale, still >= BASE_WIDTH
+        upload.seek(0)
+        self.assertEqual(load_base_image(upload).size, (240, 180))
+
+    def test_other_formats_are_reduced_before_rgb_conversion(self):
+        upload = image_file(Image.new("L", (2400, 1200), 128))
+
+        with mock.patch.object(
+            Image.Image, "convert", autospec=True, side_effect=Image.Image.convert
+        ) as convert:
+            base = load_base_image(upload)
+
+        self.assertEqual(convert.call_args.args[0].size, (240, 120))
+        self.assertEqual((base.mode, base.size), ("RGB", (240, 120)))
+
+    def test_decode_budget_is_enforced(self):
+        upload = image_file(Image.new("RGB", (2000, 2000)))
+
+        with self.assertRaises(ImageTooLarge):
+            load_base_image(upload, max_decode_bytes=1024 * 1024)
+
+
+class ConversionPoolTests(TestCase):
+    def test_job_runs_in_a_worker(self):
+        pool = ConversionPool(workers=1, max_queued=0, timeout=10)
+        self.addCleanup(pool.shutdown)
+
+        self.assertNotEqual(pool.run(os.getpid), os.getpid())
+
+    def test_full_pool_rejects_instead_of_queueing(self):
+        pool = ConversionPool(workers=1, max_queued=0, timeout=10)
+        self.addCleanup(pool.shutdown)
+        busy = threading.Thread(target=pool.run, args=(time.sleep, 1))
+        busy.start()
+        time.sleep(0.1)  # Let it take the only slot.
+        self.addCleanup(busy.join)
+
+        with self.assertRaises(PoolSaturated):
+            pool.run(time.sleep, 0)
+
+    def test_slow_job_times_out(self):
+        pool = ConversionPool(workers=1, max_queued=0, timeout=0.2)
+        self.addCleanup(pool.shutdown)
+
+        started = time.monotonic()
+        with self.assertRaises(ConversionTimeout):
+            pool.run(time.sleep, 5)
+        self.assertLess(time.monotonic() - started, 4)
+
+    def test_no_workers_runs_inline(self):
+        pool = ConversionPool(workers=0, max_queued=0, timeout=0.2)
+
+        self.assertEqual(pool.run(os.getpid), os.getpid())
+
+
+class StreamingTests(TestCase):
+    def setUp(self):
+        cache.result_cache.clear()
+        cache.base_image_cache.clear()
+        self.base = load_base_image(image_file(two_tone_image()))
+
+    def test_rows_join_to_the_full_render(self):
+        for mode in ("html", "text", "ansi"):
+            with self.subTest(mode=mode):
+                rows = list(iter_ascii_rows(self.base, 40, mode=mode))
+                separator = converter.ROW_SEPARATORS[mode]
+                self.assertEqual(len(rows), 11)
+                self.assertEqual(
+                    separator.join(rows),
+                    converter.render_ascii(self.base, 40, mode=mode),
+                )
+
+    def test_css_rows_define_classes_as_they_appear(self):
+        rows = list(iter_ascii_rows(self.base, 40, mode="css"))
+
+        self.assertEqual(rows[0].count("{background:"), 2)
+        self.assertTrue(rows[0].startswith("<style>.c0{"))
+        self.assertNotIn("<style>", "".join(rows[1:]))
+
+    def post_stream(self, mode, **headers):
+        upload = image_file(two_tone_image())
+        upload.name = "tone.png"
+        return self.client.post(
+            "/pic_to_ASCII/",
+            {"image": upload, "width": 40, "mode": mode, "stream": "1"},
+            **headers,
+        )
+
+    def test_view_streams_the_pre_block(self):
+        response = self.post_stream("html", HTTP_HX_REQUEST="true")
+
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content).decode()
+        self.assertTrue(body.startswith(views.PRE_OPEN))
+        self.assertTrue(body.endswith(views.PRE_CLOSE))
+        self.assertEqual(body.count("<br>"), 10)
+
+    def test_view_streams_plain_text(self):
+        response = self.post_stream("text")
+
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 11)
+        self.assertEqual(lines[0], "S" * 20 + "@" * 20)
+
+    def test_streamed_upload_leaves_its_base_image_cached(self):
+        self.post_stream("css")
+
+        self.assertEqual(cache.base_image_cache.stats()["size"], 1)
+
+    def test_html_rows_do_not_depend_on_numpy(self):
+        with_numpy = converter.render_ascii(self.base, 40)
+        with mock.patch.object(converter, "np", None):
+            self.assertEqual(converter.render_ascii(self.base, 40), with_numpy)
+            rows = list(iter_ascii_rows(self.base, 40))
+        self.assertEqual("<br>".join(rows), with_numpy)
+
+    def test_stream_holds_a_pool_slot_until_it_ends(self):
+        pool = ConversionPool(workers=1, max_queued=0, timeout=5)
+        with mock.patch.object(views, "get_pool", return_value=pool):
+            first = self.post_stream("text")
+            busy = self.post_stream("ansi")
+            first.close()
+            after = self.post_stream("ansi")
+            after.close()
+
+        self.assertTrue(first.streaming)
+        self.assertEqual(busy.status_code, 503)
+        self.assertTrue(after.streaming)
+
+    def test_completed_stream_is_cached(self):
+        response = self.post_stream("text")
+        body = b"".join(response.streaming_content).decode()
+
+        data = image_file(two_tone_image()).getvalue()
+        self.assertEqual(cache.cached_result(data, 40, 0, "text") + "\n", body)
+        repeat = self.post_stream("text")
+        self.assertFalse(repeat.streaming)
+        self.assertEqual(repeat.content.decode(), body.rstrip("\n"))
+
+    def test_stream_past_the_job_timeout_ends_with_an_error(self):
+        pool = ConversionPool(workers=1, max_queued=0, timeout=0)
+        with mock.patch.object(views, "get_pool", return_value=pool):
+            response = self.post_stream("text")
+            body = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(body, "Error: Conversion took too long\n")
+        data = image_file(two_tone_image()).getvalue()
+        self.assertIsNone(cache.cached_result(data, 40, 0, "text"))
+
+
+class BatchConversionTests(TestCase):
+    def setUp(self):
+        self.red_blue = two_tone_image()
+        self.blue_red = self.red_blue.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+
+    def test_gif_frames_share_one_palette(self):
+        gif = animated_gif(self.red_blue, self.blue_red).getvalue()
+
+        bundle = convert_batch([gif], 40, mode="css")
+
+        self.assertEqual(bundle["style"].count("{background:"), 2)
+        first, second = bundle["frames"]
+        self.assertEqual((first["frame"], second["frame"]), (0, 1))
+        self.assertEqual(first["duration"], 100)
+        self.assertNotIn("<style>", first["ascii"])
+        row = first["ascii"].split("<br>")[0]
+        flipped = second["ascii"].split("<br>")[0]
+        self.assertEqual(row.split("</span>")[0], flipped.split("</span>")[1])
+
+    def test_repeated_frames_are_rendered_once(self):
+        uploads = [image_file(self.red_blue).getvalue()] * 2
+
+        bundle = convert_batch(uploads, 40, mode="text")
+
+        self.assertEqual(bundle["frames"][1], {"file": 1, "frame": 0, "same_as": 0})
+        self.assertEqual(len(bundle["frames"][0]["ascii"].split("\n")), 11)
+
+    def test_batch_matches_single_conversions(self):
+        uploads = [image_file(img).getvalue() for img in (self.red_blue, self.blue_red)]
+
+        bundle = convert_batch(uploads, 40, mode="ansi")
+
+        for upload, frame in zip(uploads, bundle["frames"]):
+            self.assertEqual(
+                frame["ascii"],
+                convert_image_to_ascii(io.BytesIO(upload), 40, mode="ansi"),
+            )
+
+    def test_unreadable_upload_is_reported_per_file(self):
+        uploads = [b"not an image", image_file(self.red_blue).getvalue()]
+
+        bundle = convert_batch(uploads, 40)
+
+        self.assertEqual([e["file"] for e in bundle["errors"]], [0])
+        self.assertEqual(len(bundle["frames"]), 1)
+
+    def test_frame_limit_covers_the_whole_batch(self):
+        gif = animated_gif(self.red_blue, self.blue_red).getvalue()
+
+        with self.assertRaises(ImageTooLarge):
+            convert_batch([gif, gif], 40, max_frames=3)
+
+    def test_view_returns_json_bundle(self):
+        uploads = []
+        for name, img in (("a.png", self.red_blue), ("b.png", self.blue_red)):
+            upload = image_file(img)
+            upload.name = name
+            uploads.append(upload)
+
+        response = self.client.post(
+            "/pic_to_ASCII/batch/", {"images": uploads, "width": 40, "mode": "css"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        bundle = response.json()
+        self.assertEqual(bundle["files"], ["a.png", "b.png"])
+        self.assertEqual(len(bundle["frames"]), 2)
+
+    def test_view_requires_images(self):
+        response = self.client.post("/pic_to_ASCII/batch/")
+        self.assertEqual(response.status_code, 400)
+
+
+class BenchmarkTests(TestCase):
+    def test_synthetic_images_are_deterministic(self):
+        first = benchmark.synthetic_image((64, 48))
+        second = benchmark.synthetic_image((64, 48))
+
+        self.assertEqual(first.size, (64, 48))
+        self.assertEqual(first.tobytes(), second.tobytes())
+
+    def test_run_case_times_every_stage(self):
+        data = benchmark.encode(benchmark.synthetic_image((320, 240)), "JPEG")
+
+        result = benchmark.run_case(data, 40, impl="python", repeat=1)
+
+        for stage in benchmark.STAGES:
+            self.assertGreater(result[f"{stage}_ms"], 0)
+        self.assertGreater(result["bytes"], 0)
+        self.assertGreater(result["peak_kb"], 0)
+        self.assertIsNotNone(converter.np)  # Restored afterwards.
+
+    def test_failing_conversion_is_not_timed(self):
+        data = benchmark.encode(benchmark.synthetic_image((64, 48)), "PNG")
+
+        with mock.patch.object(converter, "render_ascii", side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                benchmark.run_case(data, 40, impl="python", repeat=1)
+
+    def test_peak_memory_counts_pixel_buffers(self):
+        # 2000x1500 RGB is about 12 MB of pixels, invisible to tracemalloc.
+        data = benchmark.encode(benchmark.synthetic_image((2000, 1500)), "PNG")
+
+        self.assertGreater(benchmark.peak_memory_kb(data, 40, "python"), 8000)
+
+    def test_regressions_flag_slower_stages_and_growth(self):
+        baseline = [{"case": "a", "html_ms": 10.0, "total_ms": 1.0, "bytes": 100}]
+        results = [
+            {
+                "case": "a",
+                "decode_ms": 5.0,
+                "resize_ms": 1.0,
+                "brightness_ms": 1.0,
+                "html_ms": 14.0,
+                "total_ms": 1.4,  # Slower, but under min_delta_ms.
+                "bytes": 101,
+                "peak_kb": 10.0,
+            }
+        ]
+
+        self.assertEqual(
+            benchmark.regressions(results, baseline, tolerance=0.25),
+            ["a html: 10.0ms -> 14.0ms"],
+        )
+        self.assertEqual(benchmark.regressions(results, baseline, tolerance=0.5), [])
+
+    def test_command_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "bench.json")
+            args = ["--size", "small", "--format", "PNG", "--widths", "40"]
+            call_command(
+                "bench_ascii",
+                *args,
+                "--repeat",
+                "1",
+                "--output",
+                output,
+                stdout=io.StringIO(),
+            )
+            with open(output) as f:
+                results = json.load(f)
+            for result in results:
+                result["html_ms"] = 0.001
+            with open(output, "w") as f:
+                json.dump(results, f)
+
+            with self.assertRaises(CommandError):
+                call_command(
+                    "bench_ascii",
+                    *args,
+                    "--repeat",
+                    "1",
+                    "--baseline",
+                    output,
+                    "--min-delta",
+                    "0",
+                    stdout=io.StringIO(),
+                )
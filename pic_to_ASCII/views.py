@@ -1,79 +1,153 @@
-from PIL import Image
-from django.http import HttpResponse
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.views.decorators.http import require_http_methods
+from django.utils.html import escape
+from django.views.decorators.http import require_http_methods, require_POST
+
+from .cache import cache_result, cached_result, convert_cached, load_cached_base
+from .converter import (
+    MAX_COLOR_LEVELS,
+    MIN_COLOR_LEVELS,
+    OUTPUT_MODES,
+    ROW_SEPARATORS,
+    ImageTooLarge,
+    convert_batch,
+    error_html,
+    iter_ascii_rows,
+)
+from .pool import ConversionTimeout, PoolSaturated, get_pool
 
-# Precomputed ASCII characters from darkest to lightest
-ASCII_CHARS = ["@", "#", "S", "%", "?", "*", "+", ";", ":", ",", "."]
+# Output modes answered with plain text rather than HTML.
+TEXT_MODES = ("text", "ansi")
+
+# The block HTMX responses wrap the ASCII art in.
+PRE_OPEN = """
+                <pre style="
+                    font-family: 'Courier New', Courier, monospace; 
+                    font-size: 8px; 
+                    line-height: 1; 
+                    letter-spacing: 0;
+                    white-space: pre; 
+                    background: #000; 
+                    padding: 20px; 
+                    overflow: auto; 
+                    display: inline-block;
+                    color: white; /* Default fallback color */
+                ">
+                    """
+PRE_CLOSE = """
+                </pre>
+            """
 
 
-def convert_image_to_ascii(image_file, width=80):
+def _conversion_options(data):
     """
-    Optimized ASCII art converter for low-resource environments
+    (width, color_levels, mode) from the POST data. Raises ValueError for
+    an unknown mode.
     """
-    try:
-        # Open image with minimal memory footprint
-        img = Image.open(image_file)
+    # Use smaller default width for free tier
+    width = int(data.get("width", 70))
+    width = max(40, min(width, 120))  # Reduced max from 200 to 120
+    # Optional colour quantization: levels per channel, 0 keeps every colour
+    color_levels = int(data.get("colors", 0))
+    if color_levels:
+        color_levels = max(MIN_COLOR_LEVELS, min(color_levels, MAX_COLOR_LEVELS))
+    # html (inline styles), css (palette classes), text or ansi
+    mode = data.get("mode", OUTPUT_MODES[0])
+    if mode not in OUTPUT_MODES:
+        raise ValueError(
+            f"Unknown mode {mode!r}; choose one of {', '.join(OUTPUT_MODES)}."
+        )
+    return width, color_levels, mode
+
+
+class _ReleasingStream:
+    """
+    Iterates `chunks` and calls `release` once they are exhausted or the
+    response is closed, even if iteration never started.
+    """
+
+    def __init__(self, chunks, release):
+        self._chunks = chunks
+        self._release = release
 
-        # 1. REDUCE IMAGE SIZE FIRST (biggest CPU saver)
-        img = img.convert("RGB")
-        aspect_ratio = img.height / img.width
-        new_height = int(width * aspect_ratio * 0.55)
-        img = img.resize((width, new_height), Image.Resampling.BILINEAR)
+    def __iter__(self):
+        return self
 
-        # 2. USE NUMPY FOR FASTER PIXEL PROCESSING (if available)
+    def __next__(self):
         try:
-            import numpy as np
-
-            pixels = np.array(img)
-
-            # Vectorized brightness calculation
-            brightness = (
-                pixels[:, :, 0] * 0.299  # R
-                + pixels[:, :, 1] * 0.587  # G
-                + pixels[:, :, 2] * 0.114  # B
-            ) / 255
-
-            ascii_indices = (brightness * (len(ASCII_CHARS) - 1)).astype(int)
-
-            ascii_art = []
-            for y in range(ascii_indices.shape[0]):
-                row_html = []
-                for x in range(ascii_indices.shape[1]):
-                    char = ASCII_CHARS[ascii_indices[y, x]]
-                    r, g, b = (
-                        int(pixels[y, x, 0]),
-                        int(pixels[y, x, 1]),
-                        int(pixels[y, x, 2]),
-                    )
-                    row_html.append(f'<span style="background-color: rgb({r},{g},{b}); color: rgb({r},{g},{b});">█</span>')
-                ascii_art.append("".join(row_html))
-
-            return "<br>".join(ascii_art)
-
-        except ImportError:
-            # Fallback for no NumPy - still optimized
-            pixels = list(img.getdata())
-            width_px = img.width
-
-            ascii_art = []
-            for i, pixel in enumerate(pixels):
-                if i % width_px == 0:
-                    ascii_art.append("<br>")
-
-                r, g, b = pixel
-                # Standard luminance formula (faster than sum)
-                brightness = int(
-                    (r * 0.299 + g * 0.587 + b * 0.114) / 255 * (len(ASCII_CHARS) - 1)
-                )
-                char = ASCII_CHARS[brightness]
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self._chunks.close()
+        self._release()
+
+
+def _rendered_rows(data, base, width, color_levels, mode, timeout):
+    """
+    iter_ascii_rows() with the pool's per-job `timeout` (None for none).
+    A stream that completes is stored in the result cache like any other
+    rendering.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    rows = []
+    for row in iter_ascii_rows(base, width, color_levels, mode):
+        if deadline is not None and time.monotonic() > deadline:
+            raise ConversionTimeout("Conversion took too long")
+        rows.append(row)
+        yield row
+    cache_result(data, width, color_levels, mode, ROW_SEPARATORS[mode].join(rows))
+
+
+def _stream_rows(rows, separator, head="", tail="", error=error_html):
+    if head:
+        yield head
+    first = True
+    try:
+        for row in rows:
+            yield row if first else separator + row
+            first = False
+    except ConversionTimeout as e:
+        # Too late for a 504: the status line has been sent.
+        yield error(e) if first else separator + error(e)
+    yield tail
 
-                ascii_art.append(f'<span style="color:rgb({r},{g},{b})">{char}</span>')
 
-            return "".join(ascii_art)
+def _streaming_response(rows, mode, is_htmx, release):
+    """
+    Sends `rows` as they are rendered, so neither the whole output nor its
+    HTMX wrapper is ever held in memory. `release` is called once the
+    stream ends.
+    """
+    separator = ROW_SEPARATORS[mode]
+    if mode == "ansi" or (mode == "text" and not is_htmx):
+        chunks = _stream_rows(rows, separator, tail="\n", error=_text_error)
+        response = StreamingHttpResponse(
+            _ReleasingStream(chunks, release),
+            content_type="text/plain; charset=utf-8",
+        )
+    else:
+        # ASCII_CHARS need no escaping in text mode.
+        error = _text_error if mode == "text" else error_html
+        chunks = _stream_rows(rows, separator, PRE_OPEN, PRE_CLOSE, error)
+        response = StreamingHttpResponse(_ReleasingStream(chunks, release))
+    response["X-Accel-Buffering"] = "no"  # Don't let a proxy buffer the stream.
+    return response
+
+
+def _text_error(error):
+    return f"Error: {error}"
 
-    except Exception as e:
-        return f"<p style='color:  red;'>Error: {str(e)}</p>"
+
+def _busy_response():
+    response = HttpResponse("Server busy, please retry shortly.", status=503)
+    response["Retry-After"] = "2"
+    return response
 
 
 @require_http_methods(["GET", "POST"])
@@ -82,30 +156,104 @@ def index(request):
         if not request.FILES.get("image"):
             return HttpResponse("No image file found in request!", status=400)
         image_file = request.FILES["image"]
-        # Use smaller default width for free tier
-        width = int(request.POST.get("width", 70))
-        width = max(40, min(width, 120))  # Reduced max from 200 to 120
+        if image_file.size > settings.ASCII_MAX_UPLOAD_BYTES:
+            return HttpResponse(
+                f"Image file is larger than {settings.ASCII_MAX_UPLOAD_BYTES} bytes!",
+                status=413,
+            )
+        try:
+            width, color_levels, mode = _conversion_options(request.POST)
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
 
-        ascii_html = convert_image_to_ascii(image_file, width)
+        # Stream the rows as they are rendered instead of building the page
+        stream = request.POST.get("stream", "").lower() in ("1", "true", "on")
 
-        if request.headers.get("HX-Request"):
-            return HttpResponse(f"""
-                <pre style="
-                    font-family: 'Courier New', Courier, monospace; 
-                    font-size: 8px; 
-                    line-height: 1; 
-                    letter-spacing: 0;
-                    white-space: pre; 
-                    background: #000; 
-                    padding: 20px; 
-                    overflow: auto; 
-                    display: inline-block;
-                    color: white; /* Default fallback color */
-                ">
-                    {ascii_html}
-                </pre>
-            """)
+        data = image_file.read()
+        pool = get_pool()
+        try:
+            if stream:
+                # A cached rendering is sent whole; it is already done.
+                ascii_html = cached_result(data, width, color_levels, mode)
+                stream = ascii_html is None
+            if stream:
+                base = load_cached_base(data, run=pool.run)
+                # The render runs in this thread, but still takes a pool slot.
+                release = pool.reserve()
+            else:
+                ascii_html = convert_cached(
+                    data, width, color_levels, mode, run=pool.run
+                )
+        except ImageTooLarge as e:
+            return HttpResponse(f"Image too large: {e}", status=413)
+        except PoolSaturated:
+            return _busy_response()
+        except ConversionTimeout:
+            return HttpResponse("Image took too long to convert.", status=504)
+        except Exception as e:
+            ascii_html = _text_error(e) if mode in TEXT_MODES else error_html(e)
+            stream = False
+
+        is_htmx = request.headers.get("HX-Request")
+        if stream:
+            timeout = pool.timeout if pool.workers > 0 else None
+            rows = _rendered_rows(data, base, width, color_levels, mode, timeout)
+            return _streaming_response(rows, mode, is_htmx, release)
+        if mode == "ansi" or (mode == "text" and not is_htmx):
+            return HttpResponse(ascii_html, content_type="text/plain; charset=utf-8")
+        if mode == "text":
+            ascii_html = escape(ascii_html)
+
+        if is_htmx:
+            return HttpResponse(f"{PRE_OPEN}{ascii_html}{PRE_CLOSE}")
 
         return render(request, "index.html", {"ascii_result": ascii_html})
 
     return render(request, "pic_to_ASCII/index.html")
+
+
+@require_POST
+def batch(request):
+    """
+    Converts every frame of several uploaded images ("images", repeated)
+    or of one animated image in a single request, returning the bundle
+    described in convert_batch() as JSON.
+    """
+    files = request.FILES.getlist("images")
+    if not files:
+        return HttpResponse("No image files found in request!", status=400)
+    if len(files) > settings.ASCII_BATCH_MAX_FILES:
+        return HttpResponse(
+            f"At most {settings.ASCII_BATCH_MAX_FILES} images per batch!", status=400
+        )
+    if sum(f.size for f in files) > settings.ASCII_MAX_UPLOAD_BYTES:
+        return HttpResponse(
+            f"Images are larger than {settings.ASCII_MAX_UPLOAD_BYTES} bytes in total!",
+            status=413,
+        )
+    try:
+        width, color_levels, mode = _conversion_options(request.POST)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
+
+    try:
+        bundle = get_pool().run(
+            convert_batch,
+            [f.read() for f in files],
+            width,
+            color_levels,
+            mode,
+            settings.ASCII_MAX_PIXELS,
+            settings.ASCII_DECODE_MAX_BYTES,
+            settings.ASCII_BATCH_MAX_FRAMES,
+        )
+    except ImageTooLarge as e:
+        return HttpResponse(f"Image too large: {e}", status=413)
+    except PoolSaturated:
+        return _busy_response()
+    except ConversionTimeout:
+        return HttpResponse("Images took too long to convert.", status=504)
+
+    bundle["files"] = [f.name for f in files]
+    # Unescaped, BLOCK is 3 bytes of UTF-8 rather than a 6-byte \u escape.
+    return JsonResponse(bundle, json_dumps_params={"ensure_ascii": False})
@@ -1,3 +1,21 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Todo
+
+
+class GetTodosConditionalTests(TestCase):
+    def test_unchanged_list_returns_304(self):
+        Todo.objects.create(title="Write tests", details="")
+        first = self.client.get("/todo/get_todos/")
+        self.assertEqual(first.status_code, 200)
+
+        with self.assertNumQueries(1):
+            second = self.client.get(
+                "/todo/get_todos/", HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+        self.assertEqual(second.status_code, 304)
+
+        Todo.objects.create(title="Ship it", details="")
+        third = self.client.get("/todo/get_todos/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(third.status_code, 200)
+        self.assertEqual(len(third.json()), 2)
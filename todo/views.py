@@ -1,3 +1,5 @@
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
@@ -5,6 +7,17 @@ from .models import Todo
 from .serializers import TodoSerializer
 
 
+def _todos_etag(request):
+    # The API never updates or deletes todos, so count and highest id change
+    # with every new one; max(date) also catches admin edits that move a todo.
+    state = Todo.objects.aggregate(
+        count=Count("id"), last_id=Max("id"), latest=Max("date")
+    )
+    latest = state["latest"].timestamp() if state["latest"] else 0
+    return f"todos-{state['count']}-{state['last_id']}-{latest}"
+
+
+@condition(etag_func=_todos_etag)
 @api_view(["GET"])
 def get_todos(request):
     todos = Todo.objects.order_by("-date")
@@ -152,3 +152,156 @@ MEDIA_URL = "/media/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Weather upstream
+# weather.client keeps up to WEATHER_POOL_SIZE idle keep-alive connections per
+# host, each for at most WEATHER_POOL_IDLE_TTL seconds, and retries network
+# errors and 429/5xx responses WEATHER_RETRIES times, backing off by a random
+# delay of up to WEATHER_RETRY_BACKOFF * 2**attempt.
+
+WEATHER_CONNECT_TIMEOUT = env.float("WEATHER_CONNECT_TIMEOUT", default=3.0)
+
+WEATHER_READ_TIMEOUT = env.float("WEATHER_READ_TIMEOUT", default=5.0)
+
+WEATHER_RETRIES = env.int("WEATHER_RETRIES", default=2)
+
+WEATHER_RETRY_BACKOFF = env.float("WEATHER_RETRY_BACKOFF", default=0.2)
+
+WEATHER_POOL_SIZE = env.int("WEATHER_POOL_SIZE", default=8)
+
+WEATHER_POOL_IDLE_TTL = env.float("WEATHER_POOL_IDLE_TTL", default=30.0)
+
+# Bounded fan-out used by weather_for_cities: at most WEATHER_FANOUT_WORKERS
+# lookups run at once and the whole request stops waiting after
+# WEATHER_FANOUT_DEADLINE seconds.
+
+WEATHER_FANOUT_WORKERS = env.int("WEATHER_FANOUT_WORKERS", default=8)
+
+WEATHER_FANOUT_DEADLINE = env.float("WEATHER_FANOUT_DEADLINE", default=10.0)
+
+# Upstream payloads are cached per city for WEATHER_CACHE_TTL seconds, then
+# served stale for up to WEATHER_CACHE_STALE_TTL more seconds while a
+# background refresh runs. At most WEATHER_CACHE_MAX_ENTRIES cities are kept.
+
+WEATHER_CACHE_TTL = env.float("WEATHER_CACHE_TTL", default=300.0)
+
+WEATHER_CACHE_STALE_TTL = env.float("WEATHER_CACHE_STALE_TTL", default=600.0)
+
+WEATHER_CACHE_MAX_ENTRIES = env.int("WEATHER_CACHE_MAX_ENTRIES", default=256)
+
+# Set WEATHER_PREFETCH_INTERVAL (seconds) below WEATHER_CACHE_TTL to keep the
+# city dropdowns warm from a background thread; 0 disables prefetching. The
+# thread runs in server processes only (see todo_site/wsgi.py and asgi.py).
+# WEATHER_PREFETCH_STAGGER spaces out the upstream calls within one pass.
+
+WEATHER_PREFETCH_INTERVAL = env.float("WEATHER_PREFETCH_INTERVAL", default=0)
+
+WEATHER_PREFETCH_STAGGER = env.float("WEATHER_PREFETCH_STAGGER", default=1.0)
+
+# After WEATHER_BREAKER_THRESHOLD consecutive upstream failures (network errors,
+# 429, 5xx) calls fail fast for WEATHER_BREAKER_RECOVERY seconds before a probe
+# is let through. Setting WEATHER_QUOTA_RATE limits calls to that many per
+# second with bursts of WEATHER_QUOTA_BURST; a call waits at most
+# WEATHER_QUOTA_WAIT seconds for quota. The limit is off (0) by default; size
+# the burst for the largest weather_for_cities fan-out before turning it on.
+
+WEATHER_BREAKER_THRESHOLD = env.int("WEATHER_BREAKER_THRESHOLD", default=5)
+
+WEATHER_BREAKER_RECOVERY = env.float("WEATHER_BREAKER_RECOVERY", default=30.0)
+
+WEATHER_QUOTA_RATE = env.float("WEATHER_QUOTA_RATE", default=0)
+
+WEATHER_QUOTA_BURST = env.int("WEATHER_QUOTA_BURST", default=10)
+
+WEATHER_QUOTA_WAIT = env.float("WEATHER_QUOTA_WAIT", default=0.5)
+
+# Rows per bulk_create call when ingesting through save_full_reports_bulk/.
+
+WEATHER_BULK_BATCH_SIZE = env.int("WEATHER_BULK_BATCH_SIZE", default=500)
+
+# With WEATHER_WRITE_BEHIND on, save_essential_report/ queues reports in memory
+# (at most WEATHER_WRITE_BEHIND_QUEUE_SIZE) and answers 202 right away. A
+# background thread writes them in batches of WEATHER_WRITE_BEHIND_BATCH_SIZE,
+# or every WEATHER_WRITE_BEHIND_INTERVAL seconds, and drains the queue on exit.
+
+WEATHER_WRITE_BEHIND = env.bool("WEATHER_WRITE_BEHIND", default=False)
+
+WEATHER_WRITE_BEHIND_QUEUE_SIZE = env.int(
+    "WEATHER_WRITE_BEHIND_QUEUE_SIZE", default=1000
+)
+
+WEATHER_WRITE_BEHIND_BATCH_SIZE = env.int(
+    "WEATHER_WRITE_BEHIND_BATCH_SIZE", default=100
+)
+
+WEATHER_WRITE_BEHIND_INTERVAL = env.float("WEATHER_WRITE_BEHIND_INTERVAL", default=1.0)
+
+# Largest page the report list endpoints return for ?limit=.
+
+WEATHER_PAGE_MAX_SIZE = env.int("WEATHER_PAGE_MAX_SIZE", default=500)
+
+# Fold new full reports into the hourly/daily rollups as they are saved. When
+# off, run `python manage.py rollup_weather` periodically instead.
+
+WEATHER_ROLLUP_ON_INGEST = env.bool("WEATHER_ROLLUP_ON_INGEST", default=True)
+
+# `python manage.py compact_weather` deletes full reports observed more than
+# WEATHER_RETENTION_DAYS ago, once they are folded into the rollups, and hourly
+# rollups older than WEATHER_HOURLY_ROLLUP_RETENTION_DAYS (0 keeps them all).
+# Rows go WEATHER_RETENTION_CHUNK_SIZE at a time, each chunk in its own
+# transaction.
+
+WEATHER_RETENTION_DAYS = env.int("WEATHER_RETENTION_DAYS", default=30)
+
+WEATHER_HOURLY_ROLLUP_RETENTION_DAYS = env.int(
+    "WEATHER_HOURLY_ROLLUP_RETENTION_DAYS", default=0
+)
+
+WEATHER_RETENTION_CHUNK_SIZE = env.int("WEATHER_RETENTION_CHUNK_SIZE", default=500)
+
+# pic_to_ASCII keeps rendered art for repeated uploads in an in-memory LRU of
+# ASCII_CACHE_MAX_BYTES characters, optionally backed by files under
+# MEDIA_ROOT/ascii_cache (ASCII_CACHE_DISK, at most ASCII_CACHE_DISK_MAX_BYTES).
+# Decoded, downscaled uploads are kept too (ASCII_BASE_CACHE_MAX_BYTES of
+# pixel data) so a new width only redoes the final resize.
+
+ASCII_CACHE_MAX_BYTES = env.int("ASCII_CACHE_MAX_BYTES", default=32 * 1024 * 1024)
+
+ASCII_CACHE_DISK = env.bool("ASCII_CACHE_DISK", default=False)
+
+ASCII_CACHE_DISK_MAX_BYTES = env.int(
+    "ASCII_CACHE_DISK_MAX_BYTES", default=256 * 1024 * 1024
+)
+
+ASCII_BASE_CACHE_MAX_BYTES = env.int(
+    "ASCII_BASE_CACHE_MAX_BYTES", default=16 * 1024 * 1024
+)
+
+# Uploads to pic_to_ASCII over ASCII_MAX_UPLOAD_BYTES, over ASCII_MAX_PIXELS, or
+# whose decoding would need more than ASCII_DECODE_MAX_BYTES of pixel memory
+# (after decoder-level downscaling) are refused with 413.
+
+ASCII_MAX_UPLOAD_BYTES = env.int("ASCII_MAX_UPLOAD_BYTES", default=20 * 1024 * 1024)
+
+ASCII_MAX_PIXELS = env.int("ASCII_MAX_PIXELS", default=100_000_000)
+
+ASCII_DECODE_MAX_BYTES = env.int("ASCII_DECODE_MAX_BYTES", default=64 * 1024 * 1024)
+
+# pic_to_ASCII converts images in ASCII_POOL_WORKERS separate processes (0 runs
+# them inline in the request thread). Up to ASCII_POOL_QUEUE_SIZE more uploads
+# may wait for a worker; beyond that requests get 503 with Retry-After. A
+# conversion running longer than ASCII_JOB_TIMEOUT seconds is stopped (504).
+
+ASCII_POOL_WORKERS = env.int("ASCII_POOL_WORKERS", default=2)
+
+ASCII_POOL_QUEUE_SIZE = env.int("ASCII_POOL_QUEUE_SIZE", default=4)
+
+ASCII_JOB_TIMEOUT = env.float("ASCII_JOB_TIMEOUT", default=10.0)
+
+# The pic_to_ASCII batch endpoint takes at most ASCII_BATCH_MAX_FILES images
+# per request (ASCII_MAX_UPLOAD_BYTES then applies to their total) and at
+# most ASCII_BATCH_MAX_FRAMES frames across them.
+
+ASCII_BATCH_MAX_FILES = env.int("ASCII_BATCH_MAX_FILES", default=20)
+
+ASCII_BATCH_MAX_FRAMES = env.int("ASCII_BATCH_MAX_FRAMES", default=200)
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "todo_site.settings")
 
 application = get_wsgi_application()
+
+# Started here rather than in an AppConfig so that only server processes
+# (runserver included) prefetch, not every manage.py command.
+from weather.prefetch import start_prefetcher  # noqa: E402
+
+prefetcher = start_prefetcher()
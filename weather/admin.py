@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import EssentialWeatherReport, FullWeatherReport
+from .models import EssentialWeatherReport, FullWeatherReport, WeatherRollup
 
 # Register your models here.
 admin.site.register(EssentialWeatherReport)
 admin.site.register(FullWeatherReport)
+admin.site.register(WeatherRollup)
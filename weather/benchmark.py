@@ -0,0 +1,185 @@
+import http.client
+import itertools
+import json
+import math
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .stub import stub_payload
+
+BENCH_CITIES = ["London", "Paris", "New York", "Tokyo", "Sydney", "Bengaluru"]
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an ascending list; None when it is empty.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _city(i):
+    return BENCH_CITIES[i % len(BENCH_CITIES)]
+
+
+def _essential_body(i):
+    payload = stub_payload(_city(i))
+    return {
+        "coordinate": f"{payload['coord']['lon']} {payload['coord']['lat']}",
+        "country_code": payload["sys"]["country"],
+        "temp": f"{payload['main']['temp'] - 273.15:.1f}°C",
+        "pressure": payload["main"]["pressure"],
+        "humidity": payload["main"]["humidity"],
+    }
+
+
+def _full_body(i):
+    # A distinct dt per request so every save is a new observation.
+    return stub_payload(_city(i), now=1_700_000_000 + i * 600)
+
+
+# name -> (method, path, body for the i-th request or None)
+SCENARIOS = {
+    "one_city": ("POST", "one_city/", lambda i: {"city": _city(i)}),
+    "weather_for_cities": (
+        "POST",
+        "weather_for_cities/",
+        lambda i: {"cities": BENCH_CITIES},
+    ),
+    "full_report": ("POST", "full_report/", lambda i: {"city": _city(i)}),
+    "save_essential_report": ("POST", "save_essential_report/", _essential_body),
+    "save_full_report": ("POST", "save_full_report/", _full_body),
+    "get_essential_reports": ("GET", "get_essential_reports/?limit=100", None),
+    "get_full_report": ("GET", "get_full_report/?limit=100", None),
+}
+
+
+class _Worker:
+    """
+    One keep-alive connection issuing requests back to back.
+    """
+
+    def __init__(self, base, timeout):
+        self.base = base
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body):
+        if self.conn is None:
+            connection_class = (
+                http.client.HTTPSConnection
+                if self.base.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            self.conn = connection_class(
+                self.base.hostname, self.base.port, timeout=self.timeout
+            )
+        headers = {"Accept": "application/json"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(method, self.base.path + path, body=data, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return None
+        if response.will_close:
+            self.close()
+        return response.status
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def run_scenario(base_url, scenario, concurrency, requests, warmup=0, timeout=30):
+    """
+    Sends `requests` requests for `scenario` from `concurrency` threads to
+    the weather API at `base_url` (e.g. http://127.0.0.1:8000/weather/),
+    after `warmup` unmeasured ones. A response is an error when it is not
+    2xx or the connection failed.
+
+    Returns throughput (requests/s) and latency percentiles in milliseconds.
+    """
+    method, path, make_body = SCENARIOS[scenario]
+    base = urlsplit(base_url.rstrip("/") + "/")
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def work(total, measured):
+        nonlocal errors
+        worker = _Worker(base, timeout)
+        try:
+            while (i := next(counter)) < total:
+                body = make_body(i) if make_body else None
+                started = time.perf_counter()
+                status = worker.request(method, path, body)
+                elapsed = (time.perf_counter() - started) * 1000
+                if measured:
+                    with lock:
+                        latencies.append(elapsed)
+                        if status is None or not 200 <= status < 300:
+                            errors += 1
+        finally:
+            worker.close()
+
+    def run_threads(total, measured):
+        threads = [
+            threading.Thread(target=work, args=(total, measured))
+            for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    if warmup:
+        run_threads(warmup, measured=False)
+        counter = itertools.count()
+
+    started = time.perf_counter()
+    run_threads(requests, measured=True)
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput": round(len(latencies) / seconds, 1) if seconds else None,
+        **{
+            f"p{p}": round(percentile(latencies, p), 2) if latencies else None
+            for p in (50, 95, 99)
+        },
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """
+    Compares p95 latency with a previous run's results. Returns a message
+    for every scenario/concurrency pair that got more than `tolerance`
+    (a fraction, e.g. 0.2) slower.
+    """
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline}
+    messages = []
+    for result in results:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if not before or not before.get("p95") or result["p95"] is None:
+            continue
+        if result["p95"] > before["p95"] * (1 + tolerance):
+            messages.append(
+                f"{result['scenario']} @ {result['concurrency']}: p95 "
+                f"{before['p95']}ms -> {result['p95']}ms"
+            )
+    return messages
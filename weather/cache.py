@@ -0,0 +1,288 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .client import UpstreamError, is_transient
+
+
+def normalize_city(city):
+    """
+    Cache key for a city name: "  new   York" and "New York" share an entry.
+    """
+    return " ".join(city.split()).casefold()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Returns (result, shared) where `shared` is True when this caller
+        waited on another thread's call instead of running `fn` itself.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class WeatherCache:
+    """
+    In-process TTL + LRU cache for upstream weather payloads.
+
+    Entries younger than `ttl` are served as-is. Entries older than `ttl` but
+    within `stale_ttl` more seconds are still served, while a background
+    thread refreshes them (stale-while-revalidate). Anything older is a miss
+    and is fetched on the request path. At most `max_entries` cities are
+    kept; the least recently used one is evicted first. Concurrent fetches
+    for the same city share one upstream call.
+
+    If a fetch fails because the upstream is unhealthy (including the circuit
+    breaker being open), the last payload seen for the city is served
+    instead, however old it is.
+    """
+
+    FRESH = "fresh"
+    STALE = "stale"
+    MISS = "miss"
+
+    def __init__(self, ttl, stale_ttl, max_entries):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._flights = SingleFlight()
+        self._async_flights = weakref.WeakKeyDictionary()  # loop -> {key: Future}
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            [
+                "hits",
+                "stale_hits",
+                "misses",
+                "coalesced",
+                "refreshes",
+                "evictions",
+                "fallbacks",
+            ],
+            0,
+        )
+
+    def get(self, city, fetch):
+        """
+        Returns the payload for `city`, calling `fetch(city)` on a miss.
+        Errors raised by `fetch` propagate and are never cached.
+        """
+        key = normalize_city(city)
+        state, entry, claimed = self._lookup(key)
+        if state == self.FRESH:
+            return entry[0]
+        if state == self.STALE:
+            if claimed:
+                threading.Thread(
+                    target=self._background_refresh,
+                    args=(key, city, fetch),
+                    daemon=True,
+                ).start()
+            return entry[0]
+
+        try:
+            return self.refresh(city, fetch)
+        except UpstreamError as e:
+            return self._fallback(entry, e)
+
+    def refresh(self, city, fetch):
+        """
+        Fetches `city` from upstream and stores the payload. Threads asking
+        for the same city while a fetch is in flight wait for that fetch.
+        """
+
+        def fetch_and_store():
+            payload = fetch(city)
+            self.set(city, payload)
+            return payload
+
+        payload, shared = self._flights.do(normalize_city(city), fetch_and_store)
+        if shared:
+            with self._lock:
+                self._counters["coalesced"] += 1
+        return payload
+
+    async def aget(self, city, fetch):
+        """
+        get() for async views: `fetch` is a coroutine function, and stale
+        entries are refreshed in a background task instead of a thread.
+        """
+        key = normalize_city(city)
+        state, entry, claimed = self._lookup(key)
+        if state == self.FRESH:
+            return entry[0]
+        if state == self.STALE:
+            if claimed:
+                task = asyncio.ensure_future(
+                    self._abackground_refresh(key, city, fetch)
+                )
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return entry[0]
+
+        try:
+            return await self.arefresh(city, fetch)
+        except UpstreamError as e:
+            return self._fallback(entry, e)
+
+    async def arefresh(self, city, fetch):
+        """
+        refresh() for async views. Coroutines on the same event loop asking
+        for the same city while a fetch is in flight await that fetch. If
+        that fetch is cancelled along with the request that started it, the
+        waiters fetch again rather than being cancelled too.
+        """
+        key = normalize_city(city)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flights = self._async_flights.setdefault(loop, {})
+
+        while key in flights:
+            flight = flights[key]
+            with self._lock:
+                self._counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled() or asyncio.current_task().cancelling():
+                    raise  # This coroutine itself was cancelled.
+
+        future = flights[key] = loop.create_future()
+        try:
+            payload = await fetch(city)
+            self.set(city, payload)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody else waited.
+            raise
+        else:
+            future.set_result(payload)
+            return payload
+        finally:
+            del flights[key]
+
+    def set(self, city, payload):
+        key = normalize_city(city)
+        with self._lock:
+            self._entries[key] = (payload, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "size": len(self._entries)}
+
+    def _lookup(self, key):
+        """
+        Classifies the entry for `key` as FRESH, STALE or MISS and counts it.
+        Returns (state, entry, claimed); for a stale entry `claimed` is True
+        for exactly one caller, which must start the background refresh.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[1]
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return self.FRESH, entry, False
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["stale_hits"] += 1
+                    claimed = key not in self._refreshing
+                    if claimed:
+                        self._refreshing.add(key)
+                        self._counters["refreshes"] += 1
+                    return self.STALE, entry, claimed
+            self._counters["misses"] += 1
+            return self.MISS, entry, False
+
+    def _fallback(self, entry, error):
+        # Serve the last known payload when the upstream is unhealthy.
+        if entry is None or not is_transient(error):
+            raise error
+        with self._lock:
+            self._counters["fallbacks"] += 1
+        return entry[0]
+
+    def _background_refresh(self, key, city, fetch):
+        try:
+            self.refresh(city, fetch)
+        except Exception:
+            # The stale entry keeps being served until it expires completely.
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _abackground_refresh(self, key, city, fetch):
+        try:
+            await self.arefresh(city, fetch)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+weather_cache = WeatherCache(
+    ttl=settings.WEATHER_CACHE_TTL,
+    stale_ttl=settings.WEATHER_CACHE_STALE_TTL,
+    max_entries=settings.WEATHER_CACHE_MAX_ENTRIES,
+)
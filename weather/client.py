@@ -0,0 +1,443 @@
+import asyncio
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from urllib.parse import urlencode, urlsplit
+
+import httpx
+from django.conf import settings
+from dotenv import load_dotenv
+
+from .resilience import CircuitBreaker, TokenBucket
+
+load_dotenv()
+
+
+class UpstreamError(Exception):
+    """
+    Base class for failures talking to the weather provider.
+    """
+
+
+class UpstreamHTTPError(UpstreamError):
+    def __init__(self, code, reason):
+        super().__init__(f"HTTP Error {code}: {reason}")
+        self.code = code
+        self.reason = reason
+
+
+class UpstreamNetworkError(UpstreamError):
+    def __init__(self, reason):
+        super().__init__(str(reason))
+        self.reason = reason
+
+
+class UpstreamUnavailable(UpstreamNetworkError):
+    """
+    Raised without touching the network when the circuit breaker is open
+    or the API key's quota is used up.
+    """
+
+
+# What a keep-alive connection the server has already closed fails with
+# before any response arrives.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+# Statuses worth another attempt; anything else (e.g. 404 city not found) is final.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_transient(error):
+    """
+    True for failures that say the upstream is unhealthy rather than that
+    the request was wrong: network errors, 429 and 5xx.
+    """
+    if isinstance(error, UpstreamHTTPError):
+        return error.code in RETRYABLE_STATUSES
+    return isinstance(error, UpstreamNetworkError)
+
+
+class _HostPool:
+    """
+    Idle keep-alive connections to one scheme://host:port. Connections idle
+    for longer than `idle_ttl` seconds (None: no limit) are closed rather
+    than reused, as the server has probably dropped them.
+    """
+
+    def __init__(self, scheme, host, port, size, idle_ttl=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self._idle = deque()  # (connection, idle since), most recent last
+        self._lock = threading.Lock()
+
+    def acquire(self, connect_timeout, read_timeout):
+        """
+        Returns (connection, whether it was reused from the pool).
+        """
+        expired = []
+        with self._lock:
+            while self._idle:
+                conn, idle_since = self._idle.pop()
+                if (
+                    self.idle_ttl is not None
+                    and time.monotonic() - idle_since > self.idle_ttl
+                ):
+                    # The rest are older still.
+                    expired = [conn] + [old for old, _ in self._idle]
+                    self._idle.clear()
+                    break
+                conn.sock.settimeout(read_timeout)
+                return conn, True
+        for conn in expired:
+            conn.close()
+        return self.connect(connect_timeout, read_timeout), False
+
+    def connect(self, connect_timeout, read_timeout):
+        connection_class = (
+            http.client.HTTPSConnection
+            if self.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        conn = connection_class(self.host, self.port, timeout=connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(read_timeout)
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+
+def city_url(city):
+    """
+    OpenWeather URL for `city`. BASE_URL and API_KEY are read from the
+    environment on every call, like the views always did.
+    """
+    return f"{os.environ.get('BASE_URL')}?" + urlencode(
+        {"q": city, "appid": os.environ.get("API_KEY")}
+    )
+
+
+class _UpstreamPolicy:
+    """
+    Retry and circuit-breaker bookkeeping shared by the sync and async
+    clients. Subclasses set retries, backoff, breaker, quota and quota_wait.
+    """
+
+    def _check_circuit(self):
+        if self.breaker is not None and not self.breaker.allow():
+            raise UpstreamUnavailable("Upstream circuit is open")
+
+    def _record(self, error=None):
+        if self.breaker is None:
+            return
+        if isinstance(error, UpstreamUnavailable):
+            # Refused locally (e.g. no quota): says nothing about upstream.
+            self.breaker.release()
+        elif error is not None and is_transient(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _release_circuit(self):
+        if self.breaker is not None:
+            self.breaker.release()
+
+    def _should_retry(self, error, attempt):
+        if isinstance(error, UpstreamUnavailable):
+            return False
+        return is_transient(error) and attempt < self.retries
+
+    def _backoff_delay(self, attempt):
+        return random.uniform(0, self.backoff * 2**attempt)
+
+
+class WeatherClient(_UpstreamPolicy):
+    """
+    Keep-alive HTTP client for the OpenWeather API.
+
+    Connections are pooled per host and reused across requests and threads,
+    for at most `idle_ttl` idle seconds. A reused connection that turns out
+    to be closed by the server is replaced and the request resent once,
+    without counting as a failed attempt. Network errors and 429/5xx
+    responses are retried up to `retries` times with full-jitter
+    exponential backoff.
+
+    Every attempt first passes through `breaker` and `quota` (either may be
+    None); when the circuit is open or no quota token frees up within
+    `quota_wait` seconds, UpstreamUnavailable is raised immediately.
+    """
+
+    def __init__(
+        self,
+        connect_timeout,
+        read_timeout,
+        retries,
+        backoff,
+        pool_size,
+        breaker=None,
+        quota=None,
+        quota_wait=0,
+        idle_ttl=None,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = breaker
+        self.quota = quota
+        self.quota_wait = quota_wait
+        self.idle_ttl = idle_ttl
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def fetch_city(self, city):
+        """
+        Returns the decoded OpenWeather payload for `city`.
+        Raises UpstreamHTTPError, UpstreamNetworkError or json.JSONDecodeError.
+        """
+        return json.loads(self.get(city_url(city)))
+
+    def get(self, url):
+        """
+        GETs `url` and returns the response body, retrying transient failures.
+        """
+        for attempt in range(self.retries + 1):
+            self._check_circuit()
+            # Every path from here records an outcome or releases the
+            # circuit, so a half-open probe is never left outstanding.
+            try:
+                if self.quota is not None and not self.quota.acquire(self.quota_wait):
+                    raise UpstreamUnavailable("Upstream quota exhausted")
+                body = self._get_once(url)
+            except UpstreamError as e:
+                self._record(e)
+                if not self._should_retry(e, attempt):
+                    raise
+            except BaseException:
+                self._release_circuit()
+                raise
+            else:
+                self._record()
+                return body
+            time.sleep(self._backoff_delay(attempt))
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+    def _pool_for(self, parts):
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _HostPool(
+                    scheme, parts.hostname, port, self.pool_size, self.idle_ttl
+                )
+            return pool
+
+    def _get_once(self, url):
+        parts = urlsplit(url)
+        if not parts.hostname:
+            raise UpstreamError(f"Invalid upstream URL: {url!r}")
+        pool = self._pool_for(parts)
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+
+        try:
+            conn, reused = pool.acquire(self.connect_timeout, self.read_timeout)
+        except OSError as e:
+            raise UpstreamNetworkError(e) from e
+
+        while True:
+            try:
+                conn.request("GET", target, headers={"Accept": "application/json"})
+                response = conn.getresponse()
+                break
+            except STALE_CONNECTION_ERRORS as e:
+                conn.close()
+                if not reused:
+                    raise UpstreamNetworkError(e) from e
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise UpstreamNetworkError(e) from e
+            # An idle connection the server had closed: no response was
+            # received, so resend once on a new connection.
+            try:
+                conn = pool.connect(self.connect_timeout, self.read_timeout)
+            except OSError as e:
+                raise UpstreamNetworkError(e) from e
+            reused = False
+
+        try:
+            body = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise UpstreamNetworkError(e) from e
+
+        if response.will_close:
+            conn.close()
+        else:
+            pool.release(conn)
+
+        if not 200 <= response.status < 300:
+            raise UpstreamHTTPError(response.status, response.reason)
+        return body
+
+
+class AsyncWeatherClient(_UpstreamPolicy):
+    """
+    Non-blocking counterpart of WeatherClient for async views, built on
+    httpx.AsyncClient. It has the same timeouts, retry policy and errors,
+    and shares the circuit breaker and quota with the sync client when
+    given the same objects. One pooled httpx client is kept per event loop.
+    """
+
+    def __init__(
+        self,
+        connect_timeout,
+        read_timeout,
+        retries,
+        backoff,
+        pool_size,
+        breaker=None,
+        quota=None,
+        quota_wait=0,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = breaker
+        self.quota = quota
+        self.quota_wait = quota_wait
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    async def fetch_city(self, city):
+        """
+        Returns the decoded OpenWeather payload for `city`.
+        Raises UpstreamHTTPError, UpstreamNetworkError or json.JSONDecodeError.
+        """
+        return json.loads(await self.get(city_url(city)))
+
+    async def get(self, url):
+        """
+        GETs `url` and returns the response body, retrying transient failures.
+        """
+        for attempt in range(self.retries + 1):
+            self._check_circuit()
+            # As in WeatherClient.get(); this includes cancellation.
+            try:
+                await self._acquire_quota()
+                body = await self._get_once(url)
+            except UpstreamError as e:
+                self._record(e)
+                if not self._should_retry(e, attempt):
+                    raise
+            except BaseException:
+                self._release_circuit()
+                raise
+            else:
+                self._record()
+                return body
+            await asyncio.sleep(self._backoff_delay(attempt))
+
+    async def _acquire_quota(self):
+        if self.quota is None:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.quota_wait
+        while not self.quota.acquire():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise UpstreamUnavailable("Upstream quota exhausted")
+            await asyncio.sleep(min(remaining, 1 / self.quota.rate))
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = self._clients[loop] = httpx.AsyncClient(
+                    timeout=httpx.Timeout(
+                        self.read_timeout, connect=self.connect_timeout
+                    ),
+                    limits=httpx.Limits(max_keepalive_connections=self.pool_size),
+                    headers={"Accept": "application/json"},
+                )
+            return client
+
+    async def _get_once(self, url):
+        try:
+            response = await self._client().get(url)
+        except (httpx.InvalidURL, httpx.UnsupportedProtocol) as e:
+            raise UpstreamError(f"Invalid upstream URL: {url!r}") from e
+        except httpx.TransportError as e:
+            raise UpstreamNetworkError(e) from e
+
+        if not response.is_success:
+            raise UpstreamHTTPError(response.status_code, response.reason_phrase)
+        return response.content
+
+
+upstream_breaker = CircuitBreaker(
+    failure_threshold=settings.WEATHER_BREAKER_THRESHOLD,
+    recovery_timeout=settings.WEATHER_BREAKER_RECOVERY,
+)
+
+upstream_quota = (
+    TokenBucket(rate=settings.WEATHER_QUOTA_RATE, capacity=settings.WEATHER_QUOTA_BURST)
+    if settings.WEATHER_QUOTA_RATE > 0
+    else None
+)
+
+weather_client = WeatherClient(
+    connect_timeout=settings.WEATHER_CONNECT_TIMEOUT,
+    read_timeout=settings.WEATHER_READ_TIMEOUT,
+    retries=settings.WEATHER_RETRIES,
+    backoff=settings.WEATHER_RETRY_BACKOFF,
+    pool_size=settings.WEATHER_POOL_SIZE,
+    breaker=upstream_breaker,
+    quota=upstream_quota,
+    quota_wait=settings.WEATHER_QUOTA_WAIT,
+    idle_ttl=settings.WEATHER_POOL_IDLE_TTL,
+)
+
+async_weather_client = AsyncWeatherClient(
+    connect_timeout=settings.WEATHER_CONNECT_TIMEOUT,
+    read_timeout=settings.WEATHER_READ_TIMEOUT,
+    retries=settings.WEATHER_RETRIES,
+    backoff=settings.WEATHER_RETRY_BACKOFF,
+    pool_size=settings.WEATHER_POOL_SIZE,
+    breaker=upstream_breaker,
+    quota=upstream_quota,
+    quota_wait=settings.WEATHER_QUOTA_WAIT,
+)
@@ -0,0 +1,84 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from weather.benchmark import SCENARIOS, regressions, run_scenario
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",")]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test a running weather API and report throughput and p50/p95/p99 "
+        "latency per endpoint and concurrency level."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default="http://127.0.0.1:8000/weather/",
+            help="Weather API under test (start it against weather_stub).",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=sorted(SCENARIOS),
+            help="Endpoint to drive; repeat for several. Defaults to all.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=_int_list,
+            default=[1, 8, 32],
+            help="Comma-separated concurrency levels.",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Measured requests per run."
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=20, help="Unmeasured requests per run."
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument(
+            "--baseline", help="Results file of an earlier run to compare against."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed p95 slowdown against the baseline, as a fraction.",
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        self.stdout.write(
+            f"{'scenario':<24}{'conc':>6}{'req/s':>10}{'p50':>10}{'p95':>10}"
+            f"{'p99':>10}{'errors':>8}"
+        )
+        for scenario in options["scenario"] or list(SCENARIOS):
+            for concurrency in options["concurrency"]:
+                result = run_scenario(
+                    options["base_url"],
+                    scenario,
+                    concurrency,
+                    options["requests"],
+                    warmup=options["warmup"],
+                )
+                results.append(result)
+                self.stdout.write(
+                    f"{scenario:<24}{concurrency:>6}{result['throughput']:>10}"
+                    f"{result['p50']:>10}{result['p95']:>10}{result['p99']:>10}"
+                    f"{result['errors']:>8}"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                slower = regressions(results, json.load(f), options["tolerance"])
+            if slower:
+                raise CommandError("Latency regressed:\n" + "\n".join(slower))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from weather.models import WeatherRollup
+from weather.retention import compact_reports, prune_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete full weather reports older than the retention horizon once they "
+        "are rolled up, and optionally old hourly rollups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.WEATHER_RETENTION_DAYS,
+            help="Keep raw reports observed within this many days.",
+        )
+        parser.add_argument(
+            "--hourly-days",
+            type=int,
+            default=settings.WEATHER_HOURLY_ROLLUP_RETENTION_DAYS,
+            help="Keep hourly rollups within this many days; 0 keeps them all.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.WEATHER_RETENTION_CHUNK_SIZE,
+            help="Rows deleted per transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between chunks.",
+        )
+
+    def handle(self, *args, **options):
+        now = int(time.time())
+        chunking = {"chunk_size": options["chunk_size"], "pause": options["pause"]}
+
+        deleted = compact_reports(now - options["days"] * 86400, **chunking)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} report(s)."))
+
+        if options["hourly_days"] > 0:
+            pruned = prune_rollups(
+                WeatherRollup.HOUR, now - options["hourly_days"] * 86400, **chunking
+            )
+            self.stdout.write(self.style.SUCCESS(f"Deleted {pruned} hourly rollup(s)."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from weather.rollups import catch_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold full weather reports newer than the watermark into hourly/daily rollups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Reports processed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        processed = catch_up(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {processed} report(s)."))
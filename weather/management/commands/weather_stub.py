@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from weather.stub import StubUpstream
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve OpenWeather-shaped payloads locally so the weather API can be "
+        "load-tested without the real provider."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8089)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Seconds every response is delayed by.",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0.02,
+            help="Up to this many extra seconds of random delay.",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of requests answered with 429/5xx.",
+        )
+        parser.add_argument("--verbose-requests", action="store_true")
+
+    def handle(self, *args, **options):
+        server = StubUpstream(
+            (options["host"], options["port"]),
+            latency=options["latency"],
+            jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            verbose=options["verbose_requests"],
+        )
+        self.stdout.write(
+            f"Stub upstream listening; run the site with BASE_URL={server.base_url}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {server.requests} request(s).")
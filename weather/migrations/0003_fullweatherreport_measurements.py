@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+def backfill_measurements(apps, schema_editor):
+    FullWeatherReport = apps.get_model("weather", "FullWeatherReport")
+    fields = ["temp", "pressure", "humidity", "wind_speed"]
+    batch = []
+    for report in FullWeatherReport.objects.only("id", "main", "wind").iterator(
+        chunk_size=500
+    ):
+        main = report.main if isinstance(report.main, dict) else {}
+        wind = report.wind if isinstance(report.wind, dict) else {}
+        report.temp = main.get("temp")
+        report.pressure = main.get("pressure")
+        report.humidity = main.get("humidity")
+        report.wind_speed = wind.get("speed")
+        batch.append(report)
+        if len(batch) == 500:
+            FullWeatherReport.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        FullWeatherReport.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("weather", "0002_essentialweatherreport"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fullweatherreport",
+            name="humidity",
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="fullweatherreport",
+            name="pressure",
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="fullweatherreport",
+            name="temp",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name="fullweatherreport",
+            name="wind_speed",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="fullweatherreport",
+            index=models.Index(
+                fields=["city_name", "dt"], name="weather_ful_city_na_9407f2_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_measurements, migrations.RunPython.noop),
+    ]
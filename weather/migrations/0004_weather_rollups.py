@@ -0,0 +1,74 @@
+# Generated by Django 5.2 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("weather", "0003_fullweatherreport_measurements"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("last_id", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="WeatherRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("city_name", models.CharField(max_length=100)),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=4
+                    ),
+                ),
+                ("bucket_start", models.BigIntegerField()),
+                ("temp_min", models.FloatField(null=True)),
+                ("temp_max", models.FloatField(null=True)),
+                ("temp_sum", models.FloatField(default=0)),
+                ("temp_count", models.IntegerField(default=0)),
+                ("pressure_min", models.FloatField(null=True)),
+                ("pressure_max", models.FloatField(null=True)),
+                ("pressure_sum", models.FloatField(default=0)),
+                ("pressure_count", models.IntegerField(default=0)),
+                ("humidity_min", models.FloatField(null=True)),
+                ("humidity_max", models.FloatField(null=True)),
+                ("humidity_sum", models.FloatField(default=0)),
+                ("humidity_count", models.IntegerField(default=0)),
+                ("wind_speed_min", models.FloatField(null=True)),
+                ("wind_speed_max", models.FloatField(null=True)),
+                ("wind_speed_sum", models.FloatField(default=0)),
+                ("wind_speed_count", models.IntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("city_name", "period", "bucket_start"),
+                        name="weather_rollup_unique_bucket",
+                    )
+                ],
+            },
+        ),
+    ]
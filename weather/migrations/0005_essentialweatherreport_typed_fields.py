@@ -0,0 +1,82 @@
+# Generated by Django 5.2 on 2026-10-18 12:36
+
+import re
+
+from django.db import migrations, models
+
+# Copies of weather.models.parse_coordinate() and parse_temperature_celsius()
+# as they were when this migration was written.
+TEMPERATURE_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*(°?\s*[CFK])?\s*$", re.IGNORECASE)
+
+
+def parse_coordinate(coordinate):
+    try:
+        lon, lat = (float(part) for part in str(coordinate).split())
+    except ValueError:
+        return None, None
+    return lon, lat
+
+
+def parse_temperature_celsius(temp):
+    match = TEMPERATURE_RE.match(str(temp))
+    if match is None:
+        return None
+    value = float(match.group(1))
+    unit = (match.group(2) or "C")[-1].upper()
+    if unit == "K":
+        return value - 273.15
+    if unit == "F":
+        return (value - 32) * 5 / 9
+    return value
+
+
+def parse_existing_reports(apps, schema_editor):
+    EssentialWeatherReport = apps.get_model("weather", "EssentialWeatherReport")
+    fields = ["lon", "lat", "temp_c"]
+    batch = []
+    for report in EssentialWeatherReport.objects.only(
+        "id", "coordinate", "temp"
+    ).iterator(chunk_size=500):
+        report.lon, report.lat = parse_coordinate(report.coordinate)
+        report.temp_c = parse_temperature_celsius(report.temp)
+        batch.append(report)
+        if len(batch) == 500:
+            EssentialWeatherReport.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        EssentialWeatherReport.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("weather", "0004_weather_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="essentialweatherreport",
+            name="lat",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name="essentialweatherreport",
+            name="lon",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name="essentialweatherreport",
+            name="temp_c",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="essentialweatherreport",
+            index=models.Index(
+                fields=["lat", "lon"], name="weather_ess_lat_c508a8_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="essentialweatherreport",
+            index=models.Index(fields=["temp_c"], name="weather_ess_temp_c_f2311c_idx"),
+        ),
+        migrations.RunPython(parse_existing_reports, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 12:44
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def delete_duplicate_reports(apps, schema_editor):
+    # Keep the newest row of every (city_name, dt) so the constraint applies.
+    FullWeatherReport = apps.get_model("weather", "FullWeatherReport")
+    duplicates = (
+        FullWeatherReport.objects.values("city_name", "dt")
+        .annotate(rows=Count("id"), keep=Max("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        FullWeatherReport.objects.filter(
+            city_name=duplicate["city_name"], dt=duplicate["dt"]
+        ).exclude(id=duplicate["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("weather", "0005_essentialweatherreport_typed_fields"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="fullweatherreport",
+            name="weather_ful_city_na_9407f2_idx",
+        ),
+        migrations.AddField(
+            model_name="fullweatherreport",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="fullweatherreport",
+            index=models.Index(fields=["dt"], name="weather_ful_dt_904ce1_idx"),
+        ),
+        migrations.RunPython(delete_duplicate_reports, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="fullweatherreport",
+            constraint=models.UniqueConstraint(
+                fields=("city_name", "dt"), name="weather_full_report_unique_city_dt"
+            ),
+        ),
+    ]
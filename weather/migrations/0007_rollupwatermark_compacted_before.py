@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("weather", "0006_fullweatherreport_unique_observation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rollupwatermark",
+            name="compacted_before",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
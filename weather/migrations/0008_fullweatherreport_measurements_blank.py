@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("weather", "0007_rollupwatermark_compacted_before"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="fullweatherreport",
+            name="humidity",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="fullweatherreport",
+            name="pressure",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="fullweatherreport",
+            name="temp",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="fullweatherreport",
+            name="wind_speed",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("weather", "0008_fullweatherreport_measurements_blank"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="essentialweatherreport",
+            name="lat",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="essentialweatherreport",
+            name="lon",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="essentialweatherreport",
+            name="temp_c",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
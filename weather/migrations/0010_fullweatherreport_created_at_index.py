@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("weather", "0009_essentialweatherreport_typed_fields_blank"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="fullweatherreport",
+            index=models.Index(
+                fields=["created_at", "id"], name="weather_ful_created_e0de0f_idx"
+            ),
+        ),
+    ]
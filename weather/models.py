@@ -1,4 +1,6 @@
-from django.db import models
+import re
+
+from django.db import models, transaction
 
 # Create your models here.
 
@@ -18,6 +20,145 @@ class FullWeatherReport(models.Model):
     timezone = models.IntegerField()
     cod = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Hot measurements copied out of the JSON fields so they can be queried
+    # without decoding JSON. Kept in sync by fill_measurements().
+    temp = models.FloatField(null=True, blank=True)  # Kelvin, from main["temp"]
+    pressure = models.IntegerField(null=True, blank=True)  # hPa, main["pressure"]
+    humidity = models.IntegerField(null=True, blank=True)  # %, main["humidity"]
+    wind_speed = models.FloatField(null=True, blank=True)  # m/s, wind["speed"]
+
+    class Meta:
+        constraints = [
+            # One row per upstream observation; see upsert_full_reports().
+            models.UniqueConstraint(
+                fields=["city_name", "dt"], name="weather_full_report_unique_city_dt"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["dt"]),
+            # Keyset pages and ?since=/?until= of get_full_report/.
+            models.Index(fields=["created_at", "id"]),
+        ]
+
+    def fill_measurements(self):
+        main = self.main if isinstance(self.main, dict) else {}
+        wind = self.wind if isinstance(self.wind, dict) else {}
+        self.temp = main.get("temp")
+        self.pressure = main.get("pressure")
+        self.humidity = main.get("humidity")
+        self.wind_speed = wind.get("speed")
+
+    def save(self, *args, **kwargs):
+        self.fill_measurements()
+        super().save(*args, **kwargs)
+
+
+FULL_REPORT_UNIQUE_FIELDS = ("city_name", "dt")
+
+# Columns overwritten when an upsert hits an observation that is already stored.
+FULL_REPORT_UPSERT_FIELDS = tuple(
+    field.name
+    for field in FullWeatherReport._meta.concrete_fields
+    if not field.primary_key
+    and field.name not in FULL_REPORT_UNIQUE_FIELDS
+    and field.name != "created_at"
+)
+
+
+def upsert_full_reports(reports, batch_size=None):
+    """
+    Stores `reports` with INSERT ... ON CONFLICT (city_name, dt) DO UPDATE,
+    so a report for an observation that is already stored replaces it
+    instead of adding a duplicate row. Later reports in `reports` win over
+    earlier ones with the same key. Returns the number of rows written.
+
+    Overwriting a report already folded into the rollups rebuilds its hour
+    and day buckets in the same transaction. Reports older than the
+    compaction horizon (see weather.rollups.compacted_before) raise
+    ValueError: their raw rows are gone, so there is no telling whether
+    the rollups already count them.
+
+    Like bulk_create(), this skips save(); call fill_measurements() first.
+    """
+    from .rollups import lock_watermark
+
+    unique = {}
+    for report in reports:
+        unique[(report.city_name, report.dt)] = report
+
+    # No savepoint of its own, and refusals are raised only after leaving
+    # the block: an exception inside it would doom the caller's transaction.
+    with transaction.atomic(savepoint=False):
+        watermark = lock_watermark()
+        horizon = watermark.compacted_before
+        # A missing dt is left for the database to reject.
+        too_old = [key for key in unique if key[1] is not None and key[1] < horizon]
+        if not too_old:
+            _upsert_locked(unique, watermark.last_id, batch_size)
+    if too_old:
+        city_name, dt = too_old[0]
+        raise ValueError(
+            f"Report for {city_name} at dt={dt} is older than the "
+            f"retained history (dt < {horizon})"
+        )
+    return len(unique)
+
+
+def _upsert_locked(unique, last_id, batch_size):
+    from .rollups import rebuild_buckets
+
+    folded = set()
+    if last_id:
+        folded = set(
+            FullWeatherReport.objects.filter(
+                id__lte=last_id,
+                city_name__in={city_name for city_name, _ in unique},
+                dt__in={dt for _, dt in unique},
+            ).values_list("city_name", "dt")
+        )
+    overwritten = [key for key in unique if key in folded]
+
+    FullWeatherReport.objects.bulk_create(
+        list(unique.values()),
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=FULL_REPORT_UNIQUE_FIELDS,
+        update_fields=FULL_REPORT_UPSERT_FIELDS,
+    )
+    if overwritten:
+        rebuild_buckets(overwritten, last_id)
+
+
+TEMPERATURE_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*(°?\s*[CFK])?\s*$", re.IGNORECASE)
+
+
+def parse_coordinate(coordinate):
+    """
+    Parses a "lon lat" string into (lon, lat) floats, or (None, None).
+    """
+    try:
+        lon, lat = (float(part) for part in str(coordinate).split())
+    except ValueError:
+        return None, None
+    return lon, lat
+
+
+def parse_temperature_celsius(temp):
+    """
+    Parses strings like "307.9K", "31.2°C" or "88.5F" into degrees Celsius.
+    A bare number is taken as Celsius. Returns None when unparseable.
+    """
+    match = TEMPERATURE_RE.match(str(temp))
+    if match is None:
+        return None
+    value = float(match.group(1))
+    unit = (match.group(2) or "C")[-1].upper()
+    if unit == "K":
+        return value - 273.15
+    if unit == "F":
+        return (value - 32) * 5 / 9
+    return value
 
 
 class EssentialWeatherReport(models.Model):
@@ -28,8 +169,81 @@ class EssentialWeatherReport(models.Model):
     humidity = models.IntegerField()  # Percentage of humidity
     pressure = models.IntegerField()  # Atmospheric pressure
     temp = models.CharField(max_length=50)  # Temperature as a string (e.g., "307.9K")
+    # Numeric copies of coordinate and temp, kept in sync by fill_typed_fields()
+    # so the database can filter and sort on them.
+    lon = models.FloatField(null=True, blank=True)
+    lat = models.FloatField(null=True, blank=True)
+    temp_c = models.FloatField(null=True, blank=True)  # Degrees Celsius
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["lat", "lon"]),
+            models.Index(fields=["temp_c"]),
+        ]
+
+    def fill_typed_fields(self):
+        self.lon, self.lat = parse_coordinate(self.coordinate)
+        self.temp_c = parse_temperature_celsius(self.temp)
+
+    def save(self, *args, **kwargs):
+        self.fill_typed_fields()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return (
             f"Weather Report for {self.country_code} at coordinates {self.coordinate}"
         )
+
+
+class WeatherRollup(models.Model):
+    """
+    Min/max/sum/count of each measurement for one city over one hour or
+    day, bucketed by the upstream `dt` (UTC). Maintained incrementally by
+    weather.rollups.catch_up().
+    """
+
+    HOUR = "hour"
+    DAY = "day"
+    PERIOD_CHOICES = [(HOUR, "Hour"), (DAY, "Day")]
+
+    city_name = models.CharField(max_length=100)
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.BigIntegerField()  # Unix time the bucket starts at
+    temp_min = models.FloatField(null=True)
+    temp_max = models.FloatField(null=True)
+    temp_sum = models.FloatField(default=0)
+    temp_count = models.IntegerField(default=0)
+    pressure_min = models.FloatField(null=True)
+    pressure_max = models.FloatField(null=True)
+    pressure_sum = models.FloatField(default=0)
+    pressure_count = models.IntegerField(default=0)
+    humidity_min = models.FloatField(null=True)
+    humidity_max = models.FloatField(null=True)
+    humidity_sum = models.FloatField(default=0)
+    humidity_count = models.IntegerField(default=0)
+    wind_speed_min = models.FloatField(null=True)
+    wind_speed_max = models.FloatField(null=True)
+    wind_speed_sum = models.FloatField(default=0)
+    wind_speed_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["city_name", "period", "bucket_start"],
+                name="weather_rollup_unique_bucket",
+            )
+        ]
+
+
+class RollupWatermark(models.Model):
+    """
+    Highest FullWeatherReport id already folded into the rollups, and the
+    upstream `dt` before which raw reports have been compacted away.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    compacted_before = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
@@ -0,0 +1,82 @@
+import logging
+import threading
+
+from django.conf import settings
+
+from .cache import normalize_city, weather_cache
+from .client import weather_client
+
+logger = logging.getLogger(__name__)
+
+
+def prefetch_cities():
+    """
+    Every city the site offers in a dropdown, without duplicates.
+    """
+    from .views.views import CITIES
+    from .views.views_static import STATIC_CITIES
+
+    seen = {}
+    for city in CITIES + STATIC_CITIES:
+        seen.setdefault(normalize_city(city), city)
+    return list(seen.values())
+
+
+class Prefetcher:
+    """
+    Background thread that keeps the known cities warm in weather_cache.
+
+    Every `interval` seconds it refreshes each city in turn, waiting
+    `stagger` seconds between upstream calls so a pass never bursts
+    through the API's rate limit.
+    """
+
+    def __init__(self, cities, interval, stagger):
+        self.cities = cities
+        self.interval = interval
+        self.stagger = stagger
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="weather-prefetch", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self):
+        for i, city in enumerate(self.cities):
+            if i and self._stop.wait(self.stagger):
+                return
+            try:
+                weather_cache.refresh(city, weather_client.fetch_city)
+            except Exception:
+                logger.warning("Prefetching weather for %s failed", city, exc_info=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+
+def start_prefetcher():
+    """
+    Starts the prefetcher when WEATHER_PREFETCH_INTERVAL is set. Called by
+    the WSGI and ASGI entry points.
+    """
+    if settings.WEATHER_PREFETCH_INTERVAL <= 0:
+        return None
+    prefetcher = Prefetcher(
+        prefetch_cities(),
+        interval=settings.WEATHER_PREFETCH_INTERVAL,
+        stagger=settings.WEATHER_PREFETCH_STAGGER,
+    )
+    prefetcher.start()
+    return prefetcher
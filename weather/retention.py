@@ -0,0 +1,61 @@
+import time
+
+from django.db import transaction
+
+from .models import FullWeatherReport, WeatherRollup
+from .rollups import PERIOD_SECONDS, catch_up, lock_watermark
+
+
+def _delete_in_chunks(queryset, chunk_size, pause):
+    """
+    Deletes `queryset` `chunk_size` rows at a time, oldest id first, each
+    chunk in its own transaction so the write lock is released in between.
+    """
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by("id").values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def compact_reports(older_than, chunk_size=500, pause=0.0):
+    """
+    Deletes full reports whose upstream `dt` is before `older_than` (Unix
+    seconds), rounded down to a whole UTC day so no rollup bucket is left
+    with only some of its reports. Pending reports are folded into the
+    rollups first and only rows at or below the rollup watermark are
+    removed, so old history survives downsampled to hourly/daily buckets.
+
+    The cut-off is recorded as the watermark's compacted_before first;
+    from then on upsert_full_reports() refuses reports older than it,
+    which could otherwise be counted in the rollups twice.
+    Returns the number of reports deleted.
+    """
+    older_than -= older_than % PERIOD_SECONDS[WeatherRollup.DAY]
+    catch_up(chunk_size=chunk_size)
+    with transaction.atomic():
+        watermark = lock_watermark()
+        if older_than > watermark.compacted_before:
+            watermark.compacted_before = older_than
+            watermark.save(update_fields=["compacted_before"])
+    return _delete_in_chunks(
+        FullWeatherReport.objects.filter(dt__lt=older_than, id__lte=watermark.last_id),
+        chunk_size,
+        pause,
+    )
+
+
+def prune_rollups(period, older_than, chunk_size=500, pause=0.0):
+    """
+    Deletes `period` rollup buckets starting before `older_than`.
+    Returns the number of buckets deleted.
+    """
+    return _delete_in_chunks(
+        WeatherRollup.objects.filter(period=period, bucket_start__lt=older_than),
+        chunk_size,
+        pause,
+    )
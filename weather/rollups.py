@@ -0,0 +1,178 @@
+import threading
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import FullWeatherReport, RollupWatermark, WeatherRollup
+
+METRICS = ("temp", "pressure", "humidity", "wind_speed")
+
+PERIOD_SECONDS = {WeatherRollup.HOUR: 3600, WeatherRollup.DAY: 86400}
+
+WATERMARK_NAME = "full_weather_report"
+
+# Serializes catch-ups inside this process so two threads never fold the
+# same rows twice. Across processes, select_for_update() on the watermark row
+# does the same on databases that support row locks.
+_lock = threading.Lock()
+
+
+def _fold(rollup, values):
+    rollup_values = {}
+    for metric in METRICS:
+        value = values[metric]
+        if value is None:
+            continue
+        low = getattr(rollup, f"{metric}_min")
+        high = getattr(rollup, f"{metric}_max")
+        rollup_values[f"{metric}_min"] = value if low is None else min(low, value)
+        rollup_values[f"{metric}_max"] = value if high is None else max(high, value)
+        rollup_values[f"{metric}_sum"] = getattr(rollup, f"{metric}_sum") + value
+        rollup_values[f"{metric}_count"] = getattr(rollup, f"{metric}_count") + 1
+    for name, value in rollup_values.items():
+        setattr(rollup, name, value)
+
+
+def _apply(rows):
+    """
+    Folds report rows (dicts of city_name, dt and METRICS) into their hourly
+    and daily buckets with one read and at most two writes.
+    """
+    touched = {}
+    for row in rows:
+        for period, seconds in PERIOD_SECONDS.items():
+            key = (row["city_name"], period, row["dt"] - row["dt"] % seconds)
+            touched.setdefault(key, []).append(row)
+
+    existing = {
+        (rollup.city_name, rollup.period, rollup.bucket_start): rollup
+        for rollup in WeatherRollup.objects.filter(
+            city_name__in={key[0] for key in touched},
+            bucket_start__in={key[2] for key in touched},
+        )
+    }
+
+    created, updated = [], []
+    for key, bucket_rows in touched.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            rollup = WeatherRollup(city_name=key[0], period=key[1], bucket_start=key[2])
+            created.append(rollup)
+        else:
+            updated.append(rollup)
+        for row in bucket_rows:
+            _fold(rollup, row)
+
+    WeatherRollup.objects.bulk_create(created)
+    WeatherRollup.objects.bulk_update(
+        updated,
+        [
+            f"{metric}_{stat}"
+            for metric in METRICS
+            for stat in ("min", "max", "sum", "count")
+        ],
+    )
+
+
+def rebuild_buckets(observations, last_id):
+    """
+    Recomputes, from the raw reports, the hourly and daily buckets of the
+    days holding the (city_name, dt) `observations`, counting only reports
+    already folded in (id <= last_id). Needed when folded reports are
+    overwritten in place, since their old values cannot be taken back out
+    of a min or max. Call inside the transaction that overwrote them.
+
+    Compaction removes whole days only, so those days' raw reports are
+    all still there.
+    """
+    day = PERIOD_SECONDS[WeatherRollup.DAY]
+    days_by_city = {}
+    for city_name, dt in observations:
+        days_by_city.setdefault(city_name, set()).add(dt - dt % day)
+
+    rebuilt = {}
+    for city_name, days in days_by_city.items():
+        in_days = Q()
+        rollups_in_days = Q()
+        for start in days:
+            in_days |= Q(dt__gte=start, dt__lt=start + day)
+            rollups_in_days |= Q(bucket_start__gte=start, bucket_start__lt=start + day)
+
+        rows = FullWeatherReport.objects.filter(
+            in_days, city_name=city_name, id__lte=last_id
+        ).values("city_name", "dt", *METRICS)
+        for row in rows:
+            for period, seconds in PERIOD_SECONDS.items():
+                key = (city_name, period, row["dt"] - row["dt"] % seconds)
+                rollup = rebuilt.get(key)
+                if rollup is None:
+                    rollup = rebuilt[key] = WeatherRollup(
+                        city_name=city_name, period=period, bucket_start=key[2]
+                    )
+                _fold(rollup, row)
+
+        WeatherRollup.objects.filter(rollups_in_days, city_name=city_name).delete()
+    WeatherRollup.objects.bulk_create(rebuilt.values())
+
+
+def lock_watermark():
+    """
+    The rollup watermark row, created if needed and locked until the end
+    of the current transaction.
+    """
+    watermarks = RollupWatermark.objects.select_for_update()
+    return watermarks.get_or_create(name=WATERMARK_NAME)[0]
+
+
+def compacted_before():
+    """
+    Upstream `dt` before which raw reports may have been compacted away
+    (0 if never). History before it lives only in the rollups.
+    """
+    return (
+        RollupWatermark.objects.filter(name=WATERMARK_NAME)
+        .values_list("compacted_before", flat=True)
+        .first()
+        or 0
+    )
+
+
+def catch_up(chunk_size=1000):
+    """
+    Folds every FullWeatherReport newer than the watermark into the rollups,
+    chunk by chunk, each chunk in its own short transaction.
+    Returns the number of reports processed.
+    """
+    processed = 0
+    with _lock:
+        while True:
+            with transaction.atomic():
+                watermark = lock_watermark()
+                rows = list(
+                    FullWeatherReport.objects.filter(id__gt=watermark.last_id)
+                    .order_by("id")
+                    .values("id", "city_name", "dt", *METRICS)[:chunk_size]
+                )
+                if not rows:
+                    return processed
+
+                _apply(rows)
+                watermark.last_id = rows[-1]["id"]
+                watermark.save(update_fields=["last_id"])
+                processed += len(rows)
+
+
+def summarize(rollup):
+    """
+    JSON-ready view of one bucket: min/max/mean/count per measurement.
+    """
+    summary = {"bucket_start": rollup.bucket_start}
+    for metric in METRICS:
+        count = getattr(rollup, f"{metric}_count")
+        summary[metric] = {
+            "min": getattr(rollup, f"{metric}_min"),
+            "max": getattr(rollup, f"{metric}_max"),
+            "mean": getattr(rollup, f"{metric}_sum") / count if count else None,
+            "count": count,
+        }
+    return summary
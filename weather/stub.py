@@ -0,0 +1,121 @@
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Statuses the stub picks from when it injects an upstream failure.
+STUB_ERROR_STATUSES = (429, 500, 502, 503)
+
+
+def stub_payload(city, now=None):
+    """
+    An OpenWeather-shaped payload for `city`. Values are derived from the
+    city name so repeated calls agree; `dt` moves with the clock.
+    """
+    seed = zlib.crc32(city.casefold().encode())
+    now = int(time.time() if now is None else now)
+    return {
+        "coord": {
+            "lon": round((seed % 36000) / 100 - 180, 2),
+            "lat": round((seed // 36000 % 18000) / 100 - 90, 2),
+        },
+        "weather": [{"id": 800, "main": "Clear", "description": "clear sky"}],
+        "base": "stations",
+        "main": {
+            "temp": round(263.15 + seed % 4000 / 100, 2),
+            "pressure": 980 + seed % 60,
+            "humidity": seed % 101,
+        },
+        "visibility": 10000,
+        "wind": {"speed": seed % 200 / 10, "deg": seed % 360},
+        "clouds": {"all": seed % 101},
+        "dt": now - now % 600,
+        "sys": {"country": "XX"},
+        "timezone": 0,
+        "name": city,
+        "cod": 200,
+    }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        city = parse_qs(urlsplit(self.path).query).get("q", [""])[0]
+        if random.random() < server.error_rate:
+            status = random.choice(STUB_ERROR_STATUSES)
+            payload = {"cod": str(status), "message": "stub upstream error"}
+        elif not city:
+            status = 400
+            payload = {"cod": "400", "message": "Nothing to geocode"}
+        else:
+            status = 200
+            payload = stub_payload(city)
+
+        with server.lock:
+            server.requests += 1
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            super().log_message(*args)
+
+
+class StubUpstream(ThreadingHTTPServer):
+    """
+    Local stand-in for the OpenWeather API, for load tests that must not
+    spend real quota. Every GET waits `latency` plus up to `jitter` seconds,
+    then answers with stub_payload(?q=) or, with probability `error_rate`,
+    one of STUB_ERROR_STATUSES.
+
+    Point the site at it with BASE_URL=http://<host>:<port>/data/2.5/weather;
+    the path is ignored.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        verbose=False,
+    ):
+        super().__init__(address, _StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/data/2.5/weather"
+
+    def start(self):
+        """
+        Serves from a daemon thread; returns immediately.
+        """
+        threading.Thread(
+            target=self.serve_forever, name="weather-stub", daemon=True
+        ).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
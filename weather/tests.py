@@ -1,3 +1,1221 @@
-from django.test import TestCase
+import asyncio
+import http.client
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .benchmark import percentile, regressions, run_scenario
+from .cache import SingleFlight, WeatherCache, weather_cache
+from .client import (
+    UpstreamHTTPError,
+    UpstreamUnavailable,
+    AsyncWeatherClient,
+    WeatherClient,
+    async_weather_client,
+    weather_client,
+)
+from .models import (
+    EssentialWeatherReport,
+    FullWeatherReport,
+    WeatherRollup,
+    parse_temperature_celsius,
+)
+from .prefetch import Prefetcher, prefetch_cities
+from .resilience import CircuitBreaker, TokenBucket
+from .retention import compact_reports, prune_rollups
+from .rollups import catch_up
+from .stub import StubUpstream
+from .writebehind import WriteBehindBuffer
+from .views import views
+from .views.pagination import encode_cursor
+
+
+def openweather_payload(name="London", dt=1700000000, temp=290.15):
+    return {
+        "coord": {"lon": -0.13, "lat": 51.51},
+        "weather": [{"id": 800, "main": "Clear", "description": "clear sky"}],
+        "base": "stations",
+        "main": {"temp": temp, "pressure": 1012, "humidity": 81},
+        "visibility": 10000,
+        "wind": {"speed": 4.1, "deg": 80},
+        "clouds": {"all": 0},
+        "dt": dt,
+        "sys": {"country": "GB"},
+        "timezone": 0,
+        "name": name,
+        "cod": 200,
+    }
+
+
+class WeatherForCitiesTests(TestCase):
+    def post_cities(self, cities):
+        return self.client.post(
+            "/weather/weather_for_cities/",
+            data=json.dumps({"cities": cities}),
+            content_type="application/json",
+        )
+
+    def test_results_keep_input_order(self):
+        delays = {"London": 0.2, "Paris": 0.0, "Tokyo": 0.1}
+
+        def fake_entry(city):
+            time.sleep(delays[city])
+            return {"city": city, "temp": "1.00°C"}
+
+        with mock.patch.object(views, "_city_weather_entry", side_effect=fake_entry):
+            response = self.post_cities(["London", "Paris", "Tokyo"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [entry["city"] for entry in response.json()], ["London", "Paris", "Tokyo"]
+        )
+
+    @override_settings(WEATHER_FANOUT_DEADLINE=0.1)
+    def test_slow_city_times_out_without_blocking_others(self):
+        def fake_entry(city):
+            if city == "Slow":
+                time.sleep(0.5)
+            return {"city": city, "temp": "1.00°C"}
+
+        with mock.patch.object(views, "_city_weather_entry", side_effect=fake_entry):
+            response = self.post_cities(["London", "Slow"])
+
+        london, slow = response.json()
+        self.assertEqual(london, {"city": "London", "temp": "1.00°C"})
+        self.assertEqual(slow["city"], "Slow")
+        self.assertIn("error", slow)
+
+    def test_local_refusal_is_not_reported_as_a_network_error(self):
+        refusal = UpstreamUnavailable("Upstream quota exhausted")
+
+        with mock.patch.object(views.weather_client, "fetch_city", side_effect=refusal):
+            response = self.post_cities(["Nowhere"])
+            single = self.client.post(
+                "/weather/full_report/",
+                data=json.dumps({"city": "Nowhere"}),
+                content_type="application/json",
+            )
+
+        expected = f"{views.UPSTREAM_UNAVAILABLE_ERROR}: Upstream quota exhausted"
+        self.assertEqual(response.json(), [{"city": "Nowhere", "error": expected}])
+        self.assertEqual(single.status_code, 503)
+        self.assertEqual(single.json(), {"error": expected})
+
+    def test_invalid_city_entry_unchanged(self):
+        response = self.post_cities([""])
+        self.assertEqual(
+            response.json(), [{"city": "", "error": "Invalid city name provided"}]
+        )
+
+    def test_ndjson_stream_sends_entries_as_they_finish(self):
+        delays = {"London": 0.2, "Paris": 0.0}
+
+        def fake_entry(city):
+            time.sleep(delays[city])
+            return {"city": city, "temp": "1.00°C"}
+
+        with mock.patch.object(views, "_city_weather_entry", side_effect=fake_entry):
+            response = self.client.post(
+                "/weather/weather_for_cities/?stream=ndjson",
+                data=json.dumps({"cities": ["London", "Paris"]}),
+                content_type="application/json",
+            )
+            lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {"city": "Paris", "temp": "1.00°C"},
+                {"city": "London", "temp": "1.00°C"},
+            ],
+        )
+
+    @override_settings(WEATHER_FANOUT_DEADLINE=0.1)
+    def test_sse_stream_reports_timeouts_and_ends(self):
+        def fake_entry(city):
+            if city == "Slow":
+                time.sleep(0.5)
+            return {"city": city}
+
+        with mock.patch.object(views, "_city_weather_entry", side_effect=fake_entry):
+            response = self.client.post(
+                "/weather/weather_for_cities/",
+                data=json.dumps({"cities": ["Slow", "London"]}),
+                content_type="application/json",
+                HTTP_ACCEPT="text/event-stream",
+            )
+            body = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = body.strip().split("\n\n")
+        self.assertEqual(
+            events,
+            [
+                'id: 1\nevent: city\ndata: {"city": "London"}',
+                "id: 0\nevent: city\ndata: "
+                + json.dumps({"city": "Slow", "error": views.FANOUT_TIMEOUT_ERROR}),
+                "event: done\ndata: {}",
+            ],
+        )
+
+
+class WeatherCacheTests(TestCase):
+    def test_fresh_entry_is_served_from_cache(self):
+        cache = WeatherCache(ttl=60, stale_ttl=0, max_entries=4)
+        fetch = mock.Mock(return_value={"cod": 200})
+
+        cache.get("New York", fetch)
+        cache.get("  new  york ", fetch)
+
+        fetch.assert_called_once_with("New York")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        cache = WeatherCache(ttl=0, stale_ttl=60, max_entries=4)
+        refreshed = mock.Mock(return_value={"version": 2})
+        cache.set("London", {"version": 1})
+
+        self.assertEqual(cache.get("London", refreshed), {"version": 1})
+        for _ in range(50):
+            if refreshed.called:
+                break
+            time.sleep(0.01)
+        refreshed.assert_called_once_with("London")
+        self.assertEqual(cache.stats()["stale_hits"], 1)
+
+    def test_least_recently_used_city_is_evicted(self):
+        cache = WeatherCache(ttl=60, stale_ttl=0, max_entries=2)
+        fetch = mock.Mock(side_effect=lambda city: {"city": city})
+
+        cache.get("London", fetch)
+        cache.get("Paris", fetch)
+        cache.get("London", fetch)
+        cache.get("Tokyo", fetch)
+        cache.get("London", fetch)
+
+        self.assertEqual(fetch.call_count, 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_errors_are_not_cached(self):
+        cache = WeatherCache(ttl=60, stale_ttl=0, max_entries=2)
+        fetch = mock.Mock(side_effect=[OSError("boom"), {"cod": 200}])
+
+        with self.assertRaises(OSError):
+            cache.get("London", fetch)
+        self.assertEqual(cache.get("London", fetch), {"cod": 200})
+
+    def test_expired_entry_is_served_when_upstream_is_down(self):
+        cache = WeatherCache(ttl=0, stale_ttl=0, max_entries=2)
+        cache.set("London", {"cod": 200})
+        fetch = mock.Mock(side_effect=UpstreamUnavailable("Upstream circuit is open"))
+
+        self.assertEqual(cache.get("London", fetch), {"cod": 200})
+        self.assertEqual(cache.stats()["fallbacks"], 1)
+        with self.assertRaises(UpstreamUnavailable):
+            cache.get("Paris", fetch)
+
+
+class AsyncWeatherCacheTests(TestCase):
+    async def test_cancelled_leader_does_not_cancel_waiters(self):
+        cache = WeatherCache(ttl=60, stale_ttl=0, max_entries=4)
+        calls = []
+
+        async def fetch(city):
+            calls.append(city)
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+            return {"cod": 200}
+
+        leader = asyncio.create_task(cache.arefresh("London", fetch))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.arefresh("London", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        self.assertEqual(await waiter, {"cod": 200})
+        self.assertEqual(len(calls), 2)
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+
+    async def test_cancelled_waiter_is_cancelled(self):
+        cache = WeatherCache(ttl=60, stale_ttl=0, max_entries=4)
+
+        async def fetch(city):
+            await asyncio.sleep(0.05)
+            return {"cod": 200}
+
+        leader = asyncio.create_task(cache.arefresh("London", fetch))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.arefresh("London", fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(await leader, {"cod": 200})
+
+
+class SingleFlightTests(TestCase):
+    def run_concurrently(self, flight, fn, count=5):
+        results, errors = [], []
+
+        def worker():
+            try:
+                results.append(flight.do("london", fn)[0])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_calls_share_one_result(self):
+        fn = mock.Mock(side_effect=lambda: time.sleep(0.1) or {"cod": 200})
+
+        results, errors = self.run_concurrently(SingleFlight(), fn)
+
+        fn.assert_called_once()
+        self.assertEqual(results, [{"cod": 200}] * 5)
+        self.assertEqual(errors, [])
+
+    def test_concurrent_calls_share_one_error(self):
+        def fail():
+            time.sleep(0.1)
+            raise OSError("upstream down")
+
+        results, errors = self.run_concurrently(SingleFlight(), fail)
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 5)
+        self.assertTrue(all(e is errors[0] for e in errors))
+
+
+class _ScriptedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = json.dumps({"cod": status, "name": "London"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _IdleClosingHandler(_ScriptedHandler):
+    timeout = 0.3  # Drops keep-alive connections idle this long.
+
+
+class WeatherClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ScriptedHandler)
+        self.server.connections = set()
+        self.server.statuses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data"
+        self.client = WeatherClient(
+            connect_timeout=1, read_timeout=1, retries=2, backoff=0, pool_size=2
+        )
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_reused(self):
+        for _ in range(3):
+            self.assertEqual(json.loads(self.client.get(self.url))["cod"], 200)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_transient_errors_are_retried(self):
+        self.server.statuses = [503, 429]
+        self.assertEqual(json.loads(self.client.get(self.url))["cod"], 200)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.statuses = [404, 200]
+        with self.assertRaises(UpstreamHTTPError) as ctx:
+            self.client.get(self.url)
+        self.assertEqual(ctx.exception.code, 404)
+        self.assertEqual(self.server.statuses, [200])
+
+    def use_idle_closing_server(self):
+        self.server.RequestHandlerClass = _IdleClosingHandler
+        self.client.retries = 0
+        self.client.breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+
+    def test_connections_closed_by_the_server_are_replaced(self):
+        self.use_idle_closing_server()
+        burst = [
+            threading.Thread(target=self.client.get, args=(self.url,)) for _ in range(4)
+        ]
+        for thread in burst:
+            thread.start()
+        for thread in burst:
+            thread.join()
+        time.sleep(0.5)
+
+        for _ in range(2):
+            self.assertEqual(json.loads(self.client.get(self.url))["cod"], 200)
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_connections_idle_past_the_ttl_are_not_reused(self):
+        self.use_idle_closing_server()
+        self.client.idle_ttl = 0.2
+        self.client.get(self.url)
+        time.sleep(0.5)
+
+        with mock.patch.object(
+            http.client.HTTPConnection,
+            "request",
+            autospec=True,
+            side_effect=http.client.HTTPConnection.request,
+        ) as request:
+            self.client.get(self.url)
+        self.assertEqual(request.call_count, 1)
+
+    def test_open_circuit_fails_fast(self):
+        self.client.breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+        self.server.statuses = [503, 503, 503, 200]
+
+        with self.assertRaises(UpstreamHTTPError):
+            self.client.get(self.url)
+        with self.assertRaises(UpstreamUnavailable):
+            self.client.get(self.url)
+        self.assertEqual(self.server.statuses, [200])
+
+    def test_exhausted_quota_fails_fast(self):
+        self.client.quota = TokenBucket(rate=0.001, capacity=1)
+
+        self.client.get(self.url)
+        with self.assertRaises(UpstreamUnavailable):
+            self.client.get(self.url)
+
+    def test_quota_refusal_does_not_hold_the_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.client.breaker = breaker
+        self.client.quota = TokenBucket(rate=0.001, capacity=1)
+        self.client.quota.acquire()
+
+        with self.assertRaisesMessage(UpstreamUnavailable, "quota"):
+            self.client.get(self.url)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+        self.client.quota = None
+        self.assertEqual(json.loads(self.client.get(self.url))["cod"], 200)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_unexpected_error_releases_the_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.client.breaker = breaker
+
+        with mock.patch.object(self.client, "_get_once", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.get(self.url)
+        self.assertTrue(breaker.allow())
+
+
+class CircuitBreakerTests(TestCase):
+    def test_half_open_allows_a_single_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens_the_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+class PrefetcherTests(TestCase):
+    def setUp(self):
+        weather_cache.clear()
+
+    def test_prefetch_cities_are_deduplicated(self):
+        cities = prefetch_cities()
+        self.assertIn("madurai", cities)
+        self.assertEqual(cities.count("London"), 1)
+
+    def test_run_once_warms_the_cache(self):
+        prefetcher = Prefetcher(["London", "Paris"], interval=60, stagger=0)
+        fetch = mock.Mock(side_effect=lambda city: {"name": city})
+
+        with mock.patch.object(weather_client, "fetch_city", fetch):
+            prefetcher.run_once()
+            weather_cache.get("london", fetch)
+
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(weather_cache.stats()["hits"], 1)
+
+
+class BulkFullReportTests(TestCase):
+    def test_ndjson_records_are_inserted_with_per_record_errors(self):
+        incomplete = openweather_payload(dt=3)
+        del incomplete["visibility"]
+        lines = [
+            json.dumps(openweather_payload(dt=1)),
+            "",
+            json.dumps(openweather_payload(dt=2)),
+            "{not json",
+            json.dumps(incomplete),
+        ]
+
+        response = self.client.post(
+            "/weather/save_full_reports_bulk/",
+            data="\n".join(lines),
+            content_type="application/x-ndjson",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body["created"], 2)
+        self.assertEqual([error["index"] for error in body["errors"]], [2, 3])
+        self.assertIn("visibility", body["errors"][1]["error"])
+        self.assertEqual(FullWeatherReport.objects.count(), 2)
+
+    @override_settings(WEATHER_BULK_BATCH_SIZE=2, WEATHER_ROLLUP_ON_INGEST=False)
+    def test_json_array_is_inserted_in_batches(self):
+        reports = [openweather_payload(dt=dt) for dt in range(5)]
+
+        # savepoint, horizon, creating the watermark (select, savepoint,
+        # insert, release), 3 batches of (lock watermark, insert), release
+        with self.assertNumQueries(12):
+            response = self.client.post(
+                "/weather/save_full_reports_bulk/",
+                data=json.dumps(reports),
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.json()["created"], 5)
+        self.assertEqual(FullWeatherReport.objects.count(), 5)
+
+    def test_non_array_json_is_rejected(self):
+        response = self.client.post(
+            "/weather/save_full_reports_bulk/",
+            data=json.dumps(openweather_payload()),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_missing_measurements_are_accepted(self):
+        calm = openweather_payload(dt=1)
+        del calm["main"]["temp"]
+        del calm["wind"]["speed"]
+
+        response = self.client.post(
+            "/weather/save_full_reports_bulk/",
+            data=json.dumps([calm]),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.json()["errors"], [])
+        report = FullWeatherReport.objects.get()
+        self.assertEqual((report.temp, report.wind_speed), (None, None))
+
+    def test_malformed_sys_is_a_record_error(self):
+        null_sys = openweather_payload(dt=2)
+        null_sys["sys"] = None
+        list_sys = openweather_payload(dt=3)
+        list_sys["sys"] = ["GB"]
+
+        response = self.client.post(
+            "/weather/save_full_reports_bulk/",
+            data=json.dumps([openweather_payload(dt=1), null_sys, list_sys]),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body["created"], 1)
+        self.assertEqual([error["index"] for error in body["errors"]], [1, 2])
+        self.assertEqual(FullWeatherReport.objects.count(), 1)
+
+        single = self.client.post(
+            "/weather/save_full_report/",
+            data=json.dumps(null_sys),
+            content_type="application/json",
+        )
+        self.assertEqual(single.status_code, 400)
+
+    def test_unexpected_record_failure_is_a_record_error(self):
+        build = views._full_report_from_payload
+
+        def fake_build(data):
+            if data["dt"] == 2:
+                raise TypeError("unexpected")
+            return build(data)
+
+        with mock.patch.object(views, "_full_report_from_payload", fake_build):
+            response = self.client.post(
+                "/weather/save_full_reports_bulk/",
+                data=json.dumps([openweather_payload(dt=dt) for dt in (1, 2)]),
+                content_type="application/json",
+            )
+
+        body = response.json()
+        self.assertEqual(body["created"], 1)
+        self.assertEqual(body["errors"], [{"index": 1, "error": ["unexpected"]}])
+
+
+class WriteBehindTests(TestCase):
+    report = {
+        "coordinate": "-0.13 51.51",
+        "country_code": "GB",
+        "humidity": 81,
+        "pressure": 1012,
+        "temp": "17.0°C",
+    }
+
+    def post_report(self, report):
+        return self.client.post(
+            "/weather/save_essential_report/",
+            data=json.dumps(report),
+            content_type="application/json",
+        )
+
+    def test_synchronous_save_by_default(self):
+        response = self.post_report(self.report)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(EssentialWeatherReport.objects.count(), 1)
+
+    @override_settings(WEATHER_WRITE_BEHIND=True)
+    def test_reports_are_queued_then_flushed_in_batches(self):
+        buffer = WriteBehindBuffer(
+            EssentialWeatherReport, max_size=2, batch_size=10, flush_interval=1
+        )
+
+        with mock.patch.object(views, "get_buffer", return_value=buffer):
+            accepted = [self.post_report(self.report) for _ in range(2)]
+            rejected = self.post_report(self.report)
+            invalid = self.post_report({**self.report, "humidity": "damp"})
+
+        self.assertEqual([r.status_code for r in accepted], [202, 202])
+        self.assertEqual(rejected.status_code, 503)
+        self.assertEqual(rejected["Retry-After"], "1")
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(EssentialWeatherReport.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(EssentialWeatherReport.objects.count(), 2)
+
+    @override_settings(WEATHER_WRITE_BEHIND=True)
+    def test_unparseable_temperature_is_queued(self):
+        buffer = WriteBehindBuffer(
+            EssentialWeatherReport, max_size=2, batch_size=10, flush_interval=1
+        )
+        missing = {**self.report, "coordinate": "None None", "temp": "N/A"}
+
+        with mock.patch.object(views, "get_buffer", return_value=buffer):
+            response = self.post_report(missing)
+
+        self.assertEqual(response.status_code, 202)
+        buffer.flush()
+        report = EssentialWeatherReport.objects.get()
+        self.assertEqual((report.lon, report.lat, report.temp_c), (None, None, None))
+
+
+class ReportListTests(TestCase):
+    def setUp(self):
+        for dt, city in enumerate(["London", "Paris", "London", "Tokyo", "London"]):
+            views._full_report_from_payload(openweather_payload(city, dt)).save()
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_keyset_pages_cover_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = self.get_json("/weather/get_full_report/", **params).json()
+            seen += [row["dt"] for row in page["results"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+
+    def test_stream_matches_buffered_response(self):
+        buffered = self.get_json("/weather/get_full_report/").json()
+        response = self.get_json("/weather/get_full_report/", stream=1)
+
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(streamed, buffered)
+        self.assertEqual(len(streamed), 5)
+
+    def test_filter_by_city(self):
+        rows = self.get_json("/weather/get_full_report/", city="london").json()
+        self.assertEqual([row["dt"] for row in rows], [0, 2, 4])
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({"cursor": "nope"}, {"limit": "x"}, {"since": "yesterday"}):
+            response = self.client.get("/weather/get_full_report/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_keyset_pages_use_the_created_at_index(self):
+        page = FullWeatherReport.objects.filter(created_at__gt=timezone.now())
+        plan = page.order_by("created_at", "id")[:10].explain()
+        self.assertIn("weather_ful_created_e0de0f_idx", plan)
+
+    def test_mistyped_cursor_values_are_rejected(self):
+        cases = [
+            ("/weather/get_full_report/", ["yesterday", 1]),
+            ("/weather/get_full_report/", [1, 1]),
+            ("/weather/get_full_report/", ["2024-01-01T00:00:00+00:00", "1"]),
+            ("/weather/get_essential_reports/", ["1"]),
+            ("/weather/get_essential_reports/", [True]),
+            ("/weather/get_essential_reports/", [1.5]),
+        ]
+        for url, values in cases:
+            response = self.client.get(url, {"cursor": encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+            self.assertEqual(response.json(), {"error": "Invalid cursor"})
+
+
+class HistoryTests(TestCase):
+    def test_history_reads_typed_columns_in_range(self):
+        reports = [
+            openweather_payload("London", dt=dt, temp=280.0 + dt) for dt in (30, 10, 20)
+        ]
+        self.client.post(
+            "/weather/save_full_reports_bulk/",
+            data=json.dumps(reports + [openweather_payload("Paris", dt=15)]),
+            content_type="application/json",
+        )
+
+        response = self.client.get(
+            "/weather/history/", {"city": "London", "start": 10, "end": 30}
+        )
+
+        self.assertEqual(
+            response.json()["points"],
+            [
+                {
+                    "dt": 10,
+                    "temp": 290.0,
+                    "pressure": 1012,
+                    "humidity": 81,
+                    "wind_speed": 4.1,
+                },
+                {
+                    "dt": 20,
+                    "temp": 300.0,
+                    "pressure": 1012,
+                    "humidity": 81,
+                    "wind_speed": 4.1,
+                },
+            ],
+        )
+
+    def test_save_keeps_measurements_in_sync(self):
+        report = views._full_report_from_payload(openweather_payload())
+        report.main = {**report.main, "temp": 250.0}
+        report.save()
+        report.refresh_from_db()
+        self.assertEqual(report.temp, 250.0)
+
+
+@override_settings(WEATHER_ROLLUP_ON_INGEST=False)
+class RollupTests(TestCase):
+    def ingest(self, *reports):
+        for report in reports:
+            views._full_report_from_payload(report).save()
+
+    def test_catch_up_only_processes_new_rows(self):
+        self.ingest(
+            openweather_payload(dt=3600, temp=280.0),
+            openweather_payload(dt=3700, temp=290.0),
+        )
+        self.assertEqual(catch_up(), 2)
+        self.assertEqual(catch_up(), 0)
+
+        self.ingest(openweather_payload(dt=7300, temp=300.0))
+        self.assertEqual(catch_up(), 1)
+
+        hours = WeatherRollup.objects.filter(period=WeatherRollup.HOUR)
+        self.assertEqual(
+            sorted(hours.values_list("bucket_start", "temp_count")),
+            [(3600, 2), (7200, 1)],
+        )
+        day = WeatherRollup.objects.get(period=WeatherRollup.DAY)
+        self.assertEqual(
+            (day.temp_min, day.temp_max, day.temp_count), (280.0, 300.0, 3)
+        )
+
+    @override_settings(WEATHER_ROLLUP_ON_INGEST=True)
+    def test_aggregates_endpoint_reads_rollups(self):
+        self.client.post(
+            "/weather/save_full_reports_bulk/",
+            data=json.dumps(
+                [
+                    openweather_payload(dt=3600, temp=280.0),
+                    openweather_payload(dt=3660, temp=290.0),
+                ]
+            ),
+            content_type="application/json",
+        )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/weather/aggregates/", {"city": "London", "period": "hour"}
+            )
+
+        (bucket,) = response.json()["buckets"]
+        self.assertEqual(bucket["bucket_start"], 3600)
+        self.assertEqual(
+            bucket["temp"], {"min": 280.0, "max": 290.0, "mean": 285.0, "count": 2}
+        )
+
+    def test_invalid_period_is_rejected(self):
+        response = self.client.get(
+            "/weather/aggregates/", {"city": "London", "period": "week"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class EssentialReportQueryTests(TestCase):
+    def setUp(self):
+        for coordinate, temp in [
+            ("-0.13 51.51", "290.15K"),  # London, 17°C
+            ("2.35 48.85", "25.0°C"),  # Paris
+            ("139.69 35.69", "31.2°C"),  # Tokyo
+            ("77.59 12.97", "N/A"),  # Bengaluru, no temperature
+        ]:
+            EssentialWeatherReport.objects.create(
+                coordinate=coordinate,
+                country_code="XX",
+                humidity=50,
+                pressure=1000,
+                temp=temp,
+            )
+
+    def get_temps(self, **params):
+        response = self.client.get("/weather/get_essential_reports/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["temp"] for row in response.json()]
+
+    def test_parse_temperature_celsius(self):
+        self.assertAlmostEqual(parse_temperature_celsius("307.9K"), 34.75)
+        self.assertEqual(parse_temperature_celsius("31.2°C"), 31.2)
+        self.assertEqual(parse_temperature_celsius("212F"), 100)
+        self.assertIsNone(parse_temperature_celsius("N/A"))
+
+    def test_bounding_box(self):
+        self.assertEqual(self.get_temps(bbox="-5,45,5,55"), ["290.15K", "25.0°C"])
+
+    def test_temperature_range(self):
+        self.assertEqual(self.get_temps(temp_min=20, temp_max=30), ["25.0°C"])
+
+    def test_invalid_bbox_is_rejected(self):
+        response = self.client.get("/weather/get_essential_reports/", {"bbox": "1,2"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalListTests(TestCase):
+    def test_essential_reports_304_until_a_report_is_added(self):
+        first = self.client.get("/weather/get_essential_reports/")
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                "/weather/get_essential_reports/", HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+        self.assertEqual(cached.status_code, 304)
+
+        EssentialWeatherReport.objects.create(
+            coordinate="0 0", country_code="XX", humidity=1, pressure=1, temp="1°C"
+        )
+        changed = self.client.get(
+            "/weather/get_essential_reports/", HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+        self.assertEqual(changed.status_code, 200)
+
+    def test_full_reports_honour_if_modified_since(self):
+        views._full_report_from_payload(openweather_payload()).save()
+        first = self.client.get("/weather/get_full_report/")
+        self.assertIn("Last-Modified", first)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                "/weather/get_full_report/",
+                HTTP_IF_MODIFIED_SINCE=first["Last-Modified"],
+            )
+        self.assertEqual(cached.status_code, 304)
+
+    async def test_async_lists_share_the_sync_validators(self):
+        await views._full_report_from_payload(openweather_payload()).asave()
+        for path in ("get_essential_reports/", "get_full_report/"):
+            sync = await sync_to_async(self.client.get)(f"/weather/{path}")
+            first = await self.async_client.get(f"/weather/async/{path}")
+            self.assertEqual(first["ETag"], sync["ETag"])
+            self.assertEqual(first.get("Last-Modified"), sync.get("Last-Modified"))
+
+            cached = await self.async_client.get(
+                f"/weather/async/{path}", headers={"if-none-match": first["ETag"]}
+            )
+            self.assertEqual(cached.status_code, 304)
+
+        cached = await self.async_client.get(
+            "/weather/async/get_full_report/",
+            headers={"if-modified-since": first["Last-Modified"]},
+        )
+        self.assertEqual(cached.status_code, 304)
+
+
+class AsyncWeatherClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ScriptedHandler)
+        self.server.connections = set()
+        self.server.statuses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data"
+        self.client = AsyncWeatherClient(
+            connect_timeout=1, read_timeout=1, retries=2, backoff=0, pool_size=2
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def test_transient_errors_are_retried(self):
+        self.server.statuses = [503, 429]
+        self.assertEqual(json.loads(await self.client.get(self.url))["cod"], 200)
+
+    async def test_client_errors_are_not_retried(self):
+        self.server.statuses = [404, 200]
+        with self.assertRaises(UpstreamHTTPError) as ctx:
+            await self.client.get(self.url)
+        self.assertEqual(ctx.exception.code, 404)
+        self.assertEqual(self.server.statuses, [200])
+
+    async def test_cancelled_probe_releases_the_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        await asyncio.sleep(0.06)
+        self.client.breaker = breaker
+
+        async def hang(url):
+            await asyncio.sleep(10)
+
+        with mock.patch.object(self.client, "_get_once", hang):
+            task = asyncio.create_task(self.client.get(self.url))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        self.assertTrue(breaker.allow())
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        weather_cache.clear()
+
+    async def test_concurrent_lookups_share_one_fetch(self):
+        calls = []
+
+        async def fetch_city(city):
+            calls.append(city)
+            await asyncio.sleep(0.05)
+            return openweather_payload(name=city)
+
+        cache = WeatherCache(ttl=60, stale_ttl=0, max_entries=4)
+        results = await asyncio.gather(
+            *(cache.aget("London", fetch_city) for _ in range(5))
+        )
+
+        self.assertEqual(calls, ["London"])
+        self.assertEqual([r["name"] for r in results], ["London"] * 5)
+        self.assertEqual(cache.stats()["coalesced"], 4)
+
+    async def test_weather_for_cities_keeps_order(self):
+        async def fetch_city(city):
+            await asyncio.sleep({"London": 0.05}.get(city, 0))
+            return openweather_payload(name=city)
+
+        with mock.patch.object(async_weather_client, "fetch_city", fetch_city):
+            response = await self.async_client.post(
+                "/weather/async/weather_for_cities/",
+                data=json.dumps({"cities": ["London", "Paris", ""]}),
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        entries = response.json()
+        self.assertEqual([e["city"] for e in entries], ["London", "Paris", ""])
+        self.assertEqual(entries[0]["temp"], "17.00°C")
+        self.assertEqual(entries[2]["error"], "Invalid city name provided")
+
+    async def test_ndjson_stream(self):
+        async def fetch_city(city):
+            await asyncio.sleep({"London": 0.05}.get(city, 0))
+            return openweather_payload(name=city)
+
+        with mock.patch.object(async_weather_client, "fetch_city", fetch_city):
+            response = await self.async_client.post(
+                "/weather/async/weather_for_cities/?stream=ndjson",
+                data=json.dumps({"cities": ["London", "Paris"]}),
+                content_type="application/json",
+            )
+            lines = [chunk async for chunk in response.streaming_content]
+
+        entries = [json.loads(line) for line in b"".join(lines).splitlines()]
+        self.assertEqual([e["city"] for e in entries], ["Paris", "London"])
+
+    @override_settings(WEATHER_FANOUT_DEADLINE=0.05)
+    async def test_slow_city_times_out(self):
+        async def fetch_city(city):
+            await asyncio.sleep(1 if city == "Slow" else 0)
+            return openweather_payload(name=city)
+
+        with mock.patch.object(async_weather_client, "fetch_city", fetch_city):
+            response = await self.async_client.post(
+                "/weather/async/weather_for_cities/",
+                data=json.dumps({"cities": ["London", "Slow"]}),
+                content_type="application/json",
+            )
+
+        london, slow = response.json()
+        self.assertNotIn("error", london)
+        self.assertEqual(slow["error"], views.FANOUT_TIMEOUT_ERROR)
+
+    @override_settings(WEATHER_ROLLUP_ON_INGEST=False)
+    async def test_save_and_list_full_reports(self):
+        response = await self.async_client.post(
+            "/weather/async/save_full_report/",
+            data=json.dumps(openweather_payload()),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+
+        listed = await self.async_client.get(
+            "/weather/async/get_full_report/", {"city": "london", "limit": 10}
+        )
+        self.assertEqual([r["city_name"] for r in listed.json()["results"]], ["London"])
+
+
+class StubUpstreamTests(TestCase):
+    def setUp(self):
+        self.stub = StubUpstream()
+        self.stub.start()
+        self.client = WeatherClient(
+            connect_timeout=1, read_timeout=1, retries=0, backoff=0, pool_size=2
+        )
+
+    def tearDown(self):
+        self.client.close()
+        self.stub.stop()
+
+    def test_serves_openweather_shaped_payloads(self):
+        with mock.patch.dict(os.environ, {"BASE_URL": self.stub.base_url}):
+            payload = self.client.fetch_city("Paris")
+
+        self.assertEqual(payload["name"], "Paris")
+        report = views._full_report_from_payload(payload)
+        self.assertIsNotNone(report.temp)
+        self.assertEqual(
+            views._city_entry_from_payload("Paris", payload)["city"], "Paris"
+        )
+
+    def test_injected_errors_are_upstream_failures(self):
+        self.stub.error_rate = 1.0
+        with mock.patch.dict(os.environ, {"BASE_URL": self.stub.base_url}):
+            with self.assertRaises(UpstreamHTTPError) as ctx:
+                self.client.fetch_city("Paris")
+        self.assertIn(ctx.exception.code, {429, 500, 502, 503})
+
+
+class BenchmarkTests(LiveServerTestCase):
+    def setUp(self):
+        weather_cache.clear()
+        self.stub = StubUpstream()
+        self.stub.start()
+        patcher = mock.patch.dict(os.environ, {"BASE_URL": self.stub.base_url})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.stub.stop)
+
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 95))
+
+    def test_run_scenario_against_stub(self):
+        result = run_scenario(
+            f"{self.live_server_url}/weather/", "one_city", concurrency=2, requests=10
+        )
+
+        self.assertEqual(result["requests"], 10)
+        self.assertEqual(result["errors"], 0)
+        self.assertLessEqual(result["p50"], result["p99"])
+
+    def test_regressions_flag_slower_p95(self):
+        baseline = [{"scenario": "one_city", "concurrency": 1, "p95": 10.0}]
+        slower = [{"scenario": "one_city", "concurrency": 1, "p95": 13.0}]
+
+        self.assertEqual(regressions(slower, baseline, tolerance=0.5), [])
+        self.assertEqual(len(regressions(slower, baseline, tolerance=0.2)), 1)
+
+
+@override_settings(WEATHER_ROLLUP_ON_INGEST=False)
+class UpsertTests(TestCase):
+    def save(self, payload):
+        return self.client.post(
+            "/weather/save_full_report/",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def test_report_without_dt_is_a_field_error(self):
+        payload = openweather_payload()
+        del payload["dt"]
+
+        for url in ("/weather/save_full_report/", "/weather/async/save_full_report/"):
+            response = self.client.post(
+                url, data=json.dumps(payload), content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("'dt'", response.json()["error"])
+        self.assertFalse(FullWeatherReport.objects.exists())
+
+    def test_resaved_observation_replaces_the_row(self):
+        self.save(openweather_payload(dt=100, temp=280.0))
+        first = FullWeatherReport.objects.get()
+        response = self.save(openweather_payload(dt=100, temp=281.0))
+
+        self.assertEqual(response.status_code, 201)
+        report = FullWeatherReport.objects.get()
+        self.assertEqual((report.id, report.temp), (first.id, 281.0))
+        self.assertEqual(report.created_at, first.created_at)
+
+    def test_bulk_duplicates_collapse_to_the_last_one(self):
+        reports = [
+            openweather_payload(dt=100, temp=280.0),
+            openweather_payload("Paris", dt=100),
+            openweather_payload(dt=100, temp=282.0),
+        ]
+        response = self.client.post(
+            "/weather/save_full_reports_bulk/",
+            data=json.dumps(reports),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.json()["created"], 2)
+        self.assertEqual(FullWeatherReport.objects.get(city_name="London").temp, 282.0)
+
+    def test_upsert_changes_the_list_etag(self):
+        self.save(openweather_payload(dt=100, temp=280.0))
+        etag = self.client.get("/weather/get_full_report/")["ETag"]
+
+        self.save(openweather_payload(dt=100, temp=281.0))
+        response = self.client.get("/weather/get_full_report/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def rollup(self, period, bucket_start):
+        return WeatherRollup.objects.get(period=period, bucket_start=bucket_start)
+
+    def test_overwritten_observation_is_refolded(self):
+        self.save(openweather_payload(dt=3600, temp=280.0))
+        self.save(openweather_payload(dt=3700, temp=285.0))
+        catch_up()
+        self.save(openweather_payload(dt=3600, temp=290.0))
+
+        hour = self.rollup(WeatherRollup.HOUR, 3600)
+        self.assertEqual((hour.temp_min, hour.temp_max), (285.0, 290.0))
+        self.assertEqual((hour.temp_sum, hour.temp_count), (575.0, 2))
+        day = self.rollup(WeatherRollup.DAY, 0)
+        self.assertEqual((day.temp_sum, day.temp_count), (575.0, 2))
+
+    def test_unfolded_overwrite_is_folded_once(self):
+        self.save(openweather_payload(dt=3600, temp=280.0))
+        self.save(openweather_payload(dt=3600, temp=290.0))
+        catch_up()
+
+        hour = self.rollup(WeatherRollup.HOUR, 3600)
+        self.assertEqual((hour.temp_max, hour.temp_count), (290.0, 1))
+
+    def test_compacted_observations_are_refused(self):
+        self.save(openweather_payload(dt=3600, temp=280.0))
+        self.save(openweather_payload(dt=90000, temp=280.0))
+        compact_reports(older_than=90000)  # Rounded down to dt 86400.
+
+        response = self.save(openweather_payload(dt=3600, temp=290.0))
+        self.assertEqual(response.status_code, 400)
+        bulk = self.client.post(
+            "/weather/save_full_reports_bulk/",
+            data=json.dumps(
+                [
+                    openweather_payload(dt=3600, temp=290.0),
+                    openweather_payload(dt=90000, temp=290.0),
+                ]
+            ),
+            content_type="application/json",
+        )
+
+        self.assertEqual(bulk.json()["created"], 1)
+        self.assertEqual(bulk.json()["errors"][0]["index"], 0)
+        catch_up()
+        hour = self.rollup(WeatherRollup.HOUR, 3600)
+        self.assertEqual((hour.temp_sum, hour.temp_count), (280.0, 1))
+        self.assertEqual(self.rollup(WeatherRollup.HOUR, 90000).temp_max, 290.0)
+
+
+class RetentionTests(TestCase):
+    @override_settings(WEATHER_ROLLUP_ON_INGEST=False)
+    def test_old_reports_are_deleted_after_rolling_up(self):
+        for dt in (3600, 3700, 90000):
+            views._full_report_from_payload(openweather_payload(dt=dt)).save()
+
+        deleted = compact_reports(older_than=86400, chunk_size=1)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(
+            list(FullWeatherReport.objects.values_list("dt", flat=True)), [90000]
+        )
+        hour = WeatherRollup.objects.get(period=WeatherRollup.HOUR, bucket_start=3600)
+        self.assertEqual(hour.temp_count, 2)
+
+    def test_old_hourly_rollups_are_pruned(self):
+        for dt in (3600, 90000):
+            views._full_report_from_payload(openweather_payload(dt=dt)).save()
+        catch_up()
+
+        self.assertEqual(prune_rollups(WeatherRollup.HOUR, older_than=86400), 1)
+        self.assertEqual(
+            sorted(WeatherRollup.objects.values_list("period", "bucket_start")),
+            [("day", 0), ("day", 86400), ("hour", 90000)],
+        )
@@ -1,14 +1,25 @@
 from django.urls import path
-from .views import views, views_static
+from .views import views, views_async, views_static
 
 urlpatterns = [
     path("", views.weather_view, name="weather_view"),
     path("one_city/", views.index),
     path("get_essential_reports/", views.get_essential_weather_reports),
     path("get_full_report/", views.get_full_weather_report),
+    path("history/", views.full_weather_history),
+    path("aggregates/", views.weather_aggregates),
     path("get_cities/", views_static.get_cities),
     path("weather_for_cities/", views.weather_for_cities),
     path("full_report/", views.full_weather_report),
     path("save_full_report/", views.save_full_weather_report),
+    path("save_full_reports_bulk/", views.save_full_weather_reports_bulk),
     path("save_essential_report/", views.save_essential_weather_report),
+    path("cache_stats/", views.weather_cache_stats),
+    path("async/one_city/", views_async.index),
+    path("async/get_essential_reports/", views_async.get_essential_weather_reports),
+    path("async/get_full_report/", views_async.get_full_weather_report),
+    path("async/weather_for_cities/", views_async.weather_for_cities),
+    path("async/full_report/", views_async.full_weather_report),
+    path("async/save_full_report/", views_async.save_full_weather_report),
+    path("async/save_essential_report/", views_async.save_essential_weather_report),
 ]
@@ -0,0 +1,219 @@
+import base64
+import json
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import DateTimeField, IntegerField, Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Rows per chunk written out by the streaming JSON response.
+STREAM_CHUNK_SIZE = 200
+
+
+def parse_limit(value, maximum):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, maximum)
+
+
+def parse_timestamp(value, name):
+    """
+    Parses an ISO 8601 query parameter; naive values are taken as UTC.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"{name} must be an ISO 8601 datetime")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def encode_cursor(values):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _cursor_value(field, value):
+    if isinstance(field, DateTimeField) and isinstance(value, str):
+        try:
+            return parse_timestamp(value, field.name)
+        except ValueError:
+            pass
+    elif isinstance(field, IntegerField) and type(value) is int:
+        return value
+    raise ValueError("Invalid cursor")
+
+
+def decode_cursor(cursor, fields):
+    """
+    Decodes a cursor made by encode_cursor() into values for the model
+    `fields` it was made from, which must be datetime or integer fields.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError("Invalid cursor")
+    return [_cursor_value(field, value) for field, value in zip(fields, values)]
+
+
+def after_cursor(ordering, values):
+    """
+    Q object selecting rows strictly after `values` in ascending `ordering`,
+    i.e. (a, b) > (x, y) written as a > x OR (a = x AND b > y).
+    """
+    condition = Q()
+    for i in reversed(range(len(ordering))):
+        step = Q(**{f"{ordering[i]}__gt": values[i]})
+        if i < len(ordering) - 1:
+            step |= Q(**{ordering[i]: values[i]}) & condition
+        condition = step
+    return condition
+
+
+class _ArrayChunker:
+    """
+    Encodes rows into comma-separated chunks of STREAM_CHUNK_SIZE rows for
+    the body of a JSON array. Shared by the sync and async streams.
+    """
+
+    def __init__(self):
+        self._encoder = DjangoJSONEncoder()
+        self._chunk = []
+        self._first = True
+
+    def push(self, row):
+        """
+        Adds a row; returns a chunk of text once enough rows are buffered.
+        """
+        self._chunk.append(self._encoder.encode(row))
+        if len(self._chunk) == STREAM_CHUNK_SIZE:
+            return self._flush()
+        return None
+
+    def finish(self):
+        return self._flush() if self._chunk else None
+
+    def _flush(self):
+        text = ("" if self._first else ",") + ",".join(self._chunk)
+        self._chunk = []
+        self._first = False
+        return text
+
+
+def stream_json_array(rows):
+    """
+    Yields a JSON array one chunk of rows at a time.
+    """
+    chunker = _ArrayChunker()
+    yield "["
+    for row in rows:
+        text = chunker.push(row)
+        if text is not None:
+            yield text
+    text = chunker.finish()
+    if text is not None:
+        yield text
+    yield "]"
+
+
+async def astream_json_array(rows):
+    """
+    stream_json_array() over an async iterator of rows.
+    """
+    chunker = _ArrayChunker()
+    yield "["
+    async for row in rows:
+        text = chunker.push(row)
+        if text is not None:
+            yield text
+    text = chunker.finish()
+    if text is not None:
+        yield text
+    yield "]"
+
+
+def _page_query(queryset, params, fields, ordering, max_page_size):
+    """
+    The queryset for one keyset page and its limit. One extra row is
+    fetched to tell whether there is a next page.
+    """
+    limit = parse_limit(params.get("limit", max_page_size), max_page_size)
+    if params.get("cursor"):
+        columns = [queryset.model._meta.get_field(name) for name in ordering]
+        values = decode_cursor(params["cursor"], columns)
+        queryset = queryset.filter(after_cursor(ordering, values))
+    return queryset.values(*fields, *ordering)[: limit + 1], limit
+
+
+def _page_response(rows, limit, fields, ordering):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][name] for name in ordering])
+    hidden = [name for name in ordering if name not in fields]
+    for row in rows:
+        for name in hidden:
+            del row[name]
+    return JsonResponse({"results": rows, "next_cursor": next_cursor})
+
+
+def _wants_page(params):
+    return "limit" in params or "cursor" in params
+
+
+def _wants_stream(params):
+    return params.get("stream") in ("1", "true")
+
+
+def list_response(request, queryset, fields, ordering, max_page_size):
+    """
+    Serializes `fields` of `queryset` in ascending `ordering`.
+
+    ?limit=N returns one keyset page as {"results": [...], "next_cursor": ...};
+    pass the cursor back as ?cursor=... for the next page. ?stream=1 streams
+    every row as a JSON array without materializing model instances.
+    Otherwise the whole result is returned as a JSON array, as before.
+    Raises ValueError for bad parameters.
+    """
+    queryset = queryset.order_by(*ordering)
+    params = request.GET
+
+    if _wants_page(params):
+        page, limit = _page_query(queryset, params, fields, ordering, max_page_size)
+        return _page_response(list(page), limit, fields, ordering)
+
+    rows = queryset.values(*fields)
+    if _wants_stream(params):
+        return StreamingHttpResponse(
+            stream_json_array(rows.iterator(chunk_size=STREAM_CHUNK_SIZE)),
+            content_type="application/json",
+        )
+    return JsonResponse(list(rows), safe=False)
+
+
+async def alist_response(request, queryset, fields, ordering, max_page_size):
+    """
+    list_response() for async views, reading through the async ORM.
+    """
+    queryset = queryset.order_by(*ordering)
+    params = request.GET
+
+    if _wants_page(params):
+        page, limit = _page_query(queryset, params, fields, ordering, max_page_size)
+        return _page_response([row async for row in page], limit, fields, ordering)
+
+    rows = queryset.values(*fields)
+    if _wants_stream(params):
+        return StreamingHttpResponse(
+            astream_json_array(rows.aiterator(chunk_size=STREAM_CHUNK_SIZE)),
+            content_type="application/json",
+        )
+    return JsonResponse([row async for row in rows], safe=False)
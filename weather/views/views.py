@@ -1,14 +1,33 @@
-import os
 import json
-import urllib.request
-from django.http import JsonResponse, HttpResponse
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
-from ..models import EssentialWeatherReport, FullWeatherReport
-from dotenv import load_dotenv
-
-load_dotenv()
-
+from django.views.decorators.http import condition
+from ..cache import weather_cache
+from ..client import (
+    UpstreamHTTPError,
+    UpstreamNetworkError,
+    UpstreamUnavailable,
+    weather_client,
+)
+from ..models import (
+    EssentialWeatherReport,
+    FullWeatherReport,
+    WeatherRollup,
+    upsert_full_reports,
+)
+from ..rollups import PERIOD_SECONDS, catch_up, compacted_before, summarize
+from ..writebehind import get_buffer
+from .pagination import list_response, parse_timestamp
+
+logger = logging.getLogger(__name__)
 
 CITIES = [
     "London",
@@ -21,6 +40,13 @@ CITIES = [
     "Moscow",
 ]
 
+INVALID_CITY_ERROR = "Invalid city name provided"
+
+FANOUT_TIMEOUT_ERROR = "Timed out waiting for weather data"
+
+# Prefix for calls refused locally by the circuit breaker or the quota.
+UPSTREAM_UNAVAILABLE_ERROR = "Weather service temporarily unavailable"
+
 
 def weather_view(request):
     """
@@ -39,9 +65,7 @@ def weather_view(request):
             if city not in CITIES:
                 return HttpResponse(f"City '{city}' not found.", status=404)
 
-            url = f"{os.environ.get('BASE_URL')}?q={city}&appid={os.environ.get('API_KEY')}"
-            source = urllib.request.urlopen(url).read()
-            list_of_data = json.loads(source)
+            list_of_data = weather_cache.get(city, weather_client.fetch_city)
 
             temp_kelvin = list_of_data.get("main", {}).get("temp")
             temp_celsius = (
@@ -65,6 +89,19 @@ def weather_view(request):
     return HttpResponse("Method not allowed", status=405)
 
 
+def _essential_from_payload(list_of_data):
+    """
+    The one_city/ response for an upstream payload.
+    """
+    return {
+        "country_code": list_of_data["sys"]["country"],
+        "coordinate": f"{list_of_data['coord']['lon']} {list_of_data['coord']['lat']}",
+        "temp": f"{list_of_data['main']['temp'] - 273.15}°C",
+        "pressure": list_of_data["main"]["pressure"],
+        "humidity": list_of_data["main"]["humidity"],
+    }
+
+
 @csrf_exempt
 def index(request):
     if request.method == "POST":
@@ -76,18 +113,9 @@ def index(request):
             if not city:
                 return JsonResponse({"error": "City not provided"}, status=400)
 
-            url = f"{os.environ.get('BASE_URL')}?q={city}&appid={os.environ.get('API_KEY')}"
-            source = urllib.request.urlopen(url).read()
-            list_of_data = json.loads(source)
+            list_of_data = weather_cache.get(city, weather_client.fetch_city)
 
-            data = {
-                "country_code": list_of_data["sys"]["country"],
-                "coordinate": f"{list_of_data['coord']['lon']} {list_of_data['coord']['lat']}",
-                "temp": f"{list_of_data['main']['temp'] - 273.15}°C",
-                "pressure": list_of_data["main"]["pressure"],
-                "humidity": list_of_data["main"]["humidity"],
-            }
-            return JsonResponse(data)
+            return JsonResponse(_essential_from_payload(list_of_data))
 
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON"}, status=400)
@@ -97,11 +125,174 @@ def index(request):
     return JsonResponse({"error": "Only POST method allowed"}, status=405)
 
 
+def _city_entry_from_payload(city, list_of_data):
+    """
+    The weather_for_cities entry for a city's upstream payload.
+    """
+    if str(list_of_data.get("cod")) != "200":  # API error
+        return {
+            "city": city,
+            "error": list_of_data.get("message", "API error"),
+        }
+
+    temp_kelvin = list_of_data.get("main", {}).get("temp")
+    temp_celsius = f"{temp_kelvin - 273.15:.2f}°C" if temp_kelvin is not None else "N/A"
+
+    return {
+        "city": city,
+        "country_code": list_of_data.get("sys", {}).get("country"),
+        "coordinate": f"{list_of_data.get('coord', {}).get('lon')} {list_of_data.get('coord', {}).get('lat')}",
+        "temp": temp_celsius,
+        "pressure": list_of_data.get("main", {}).get("pressure"),
+        "humidity": list_of_data.get("main", {}).get("humidity"),
+        "description": (
+            list_of_data.get("weather", [{}])[0].get("description", "")
+            if list_of_data.get("weather")
+            else ""
+        ),
+    }
+
+
+def _city_error_entry(city, error):
+    """
+    The weather_for_cities entry for a lookup that raised `error`.
+    """
+    if isinstance(error, UpstreamHTTPError):
+        return {
+            "city": city,
+            "error": f"API request failed: {error.code} {error.reason}",
+        }
+    if isinstance(error, UpstreamUnavailable):
+        return {"city": city, "error": f"{UPSTREAM_UNAVAILABLE_ERROR}: {error.reason}"}
+    if isinstance(error, UpstreamNetworkError):
+        return {"city": city, "error": f"Network error: {error.reason}"}
+    if isinstance(error, json.JSONDecodeError):
+        return {"city": city, "error": "Failed to decode API response"}
+    return {"city": city, "error": f"Unexpected error: {str(error)}"}
+
+
+def _is_valid_city(city):
+    return isinstance(city, str) and bool(city.strip())
+
+
+def _city_weather_entry(city):
+    """
+    Builds the weather_for_cities entry for a single city.
+    Never raises: upstream failures are reported as {"city": ..., "error": ...}.
+    """
+    if not _is_valid_city(city):
+        return {"city": city, "error": INVALID_CITY_ERROR}
+
+    try:
+        return _city_entry_from_payload(
+            city, weather_cache.get(city, weather_client.fetch_city)
+        )
+    except Exception as e:
+        return _city_error_entry(city, e)
+
+
+def _iter_weather_for_city_list(cities):
+    """
+    Looks up every city concurrently on a bounded thread pool and yields
+    (position in `cities`, entry) as each lookup finishes. Cities that miss
+    the overall deadline are yielded last, with a timeout error entry,
+    instead of holding the request.
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(len(cities), settings.WEATHER_FANOUT_WORKERS))
+    )
+    try:
+        futures = {
+            executor.submit(_city_weather_entry, city): index
+            for index, city in enumerate(cities)
+        }
+        pending = set(futures)
+        try:
+            for future in as_completed(
+                futures, timeout=settings.WEATHER_FANOUT_DEADLINE
+            ):
+                pending.discard(future)
+                yield futures[future], future.result()
+        except TimeoutError:
+            pass
+        for index in sorted(futures[future] for future in pending):
+            yield index, {"city": cities[index], "error": FANOUT_TIMEOUT_ERROR}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _weather_for_city_list(cities):
+    """
+    Every city's entry, in the order of `cities`.
+    """
+    entries = [None] * len(cities)
+    for index, entry in _iter_weather_for_city_list(cities):
+        entries[index] = entry
+    return entries
+
+
+NDJSON = "ndjson"
+SSE = "sse"
+
+STREAM_CONTENT_TYPES = {NDJSON: "application/x-ndjson", SSE: "text/event-stream"}
+
+
+def _city_stream_format(request):
+    """
+    NDJSON or SSE when the client opted into a streamed weather_for_cities
+    response with ?stream=ndjson|sse or a matching Accept header; else None.
+    """
+    requested = request.GET.get("stream")
+    if requested in STREAM_CONTENT_TYPES:
+        return requested
+    accept = request.headers.get("Accept", "")
+    for stream_format, content_type in STREAM_CONTENT_TYPES.items():
+        if content_type in accept:
+            return stream_format
+    return None
+
+
+def _encode_city_event(stream_format, index, entry):
+    data = json.dumps(entry, cls=DjangoJSONEncoder)
+    if stream_format == SSE:
+        # The event id is the city's position in the request.
+        return f"id: {index}\nevent: city\ndata: {data}\n\n"
+    return data + "\n"
+
+
+# Tells an SSE client that every city has been sent.
+SSE_DONE_EVENT = "event: done\ndata: {}\n\n"
+
+
+def _city_stream_response(stream_format, events):
+    """
+    StreamingHttpResponse over `events`, the already-encoded chunks.
+    """
+    response = StreamingHttpResponse(
+        events, content_type=STREAM_CONTENT_TYPES[stream_format]
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Don't let a proxy buffer the stream.
+    return response
+
+
+def _stream_weather_for_city_list(stream_format, cities):
+    for index, entry in _iter_weather_for_city_list(cities):
+        yield _encode_city_event(stream_format, index, entry)
+    if stream_format == SSE:
+        yield SSE_DONE_EVENT
+
+
 @csrf_exempt
 def weather_for_cities(request):
     """
     Fetches weather data for a list of cities provided in a POST request.
     Expects JSON: {"cities": ["London", "Tokyo", "NonExistentCity"]}
+
+    With ?stream=ndjson or ?stream=sse (or Accept: application/x-ndjson or
+    text/event-stream) each city's entry is sent as soon as it is ready, in
+    completion order: one JSON line per city, or one "city" event per city
+    whose id is its position in the list, then a final "done" event.
     """
     if request.method == "POST":
         try:
@@ -115,72 +306,13 @@ def weather_for_cities(request):
                     status=400,
                 )
 
-            weather_data_list = []
-
-            for city in cities:
-                if not isinstance(city, str) or not city.strip():
-                    weather_data_list.append(
-                        {"city": city, "error": "Invalid city name provided"}
-                    )
-                    continue
-
-                url = f"{os.environ.get('BASE_URL')}?q={city}&appid={os.environ.get('API_KEY')}"
-
-                try:
-                    source = urllib.request.urlopen(url).read()
-                    list_of_data = json.loads(source)
-
-                    if str(list_of_data.get("cod")) != "200":  # API error
-                        weather_data_list.append(
-                            {
-                                "city": city,
-                                "error": list_of_data.get("message", "API error"),
-                            }
-                        )
-                    else:
-                        temp_kelvin = list_of_data.get("main", {}).get("temp")
-                        temp_celsius = (
-                            f"{temp_kelvin - 273.15:.2f}°C"
-                            if temp_kelvin is not None
-                            else "N/A"
-                        )
+            stream_format = _city_stream_format(request)
+            if stream_format:
+                return _city_stream_response(
+                    stream_format, _stream_weather_for_city_list(stream_format, cities)
+                )
 
-                        data = {
-                            "city": city,
-                            "country_code": list_of_data.get("sys", {}).get("country"),
-                            "coordinate": f"{list_of_data.get('coord', {}).get('lon')} {list_of_data.get('coord', {}).get('lat')}",
-                            "temp": temp_celsius,
-                            "pressure": list_of_data.get("main", {}).get("pressure"),
-                            "humidity": list_of_data.get("main", {}).get("humidity"),
-                            "description": (
-                                list_of_data.get("weather", [{}])[0].get(
-                                    "description", ""
-                                )
-                                if list_of_data.get("weather")
-                                else ""
-                            ),
-                        }
-                        weather_data_list.append(data)
-
-                except urllib.error.HTTPError as e:
-                    weather_data_list.append(
-                        {
-                            "city": city,
-                            "error": f"API request failed: {e.code} {e.reason}",
-                        }
-                    )
-                except urllib.error.URLError as e:
-                    weather_data_list.append(
-                        {"city": city, "error": f"Network error: {e.reason}"}
-                    )
-                except json.JSONDecodeError:
-                    weather_data_list.append(
-                        {"city": city, "error": "Failed to decode API response"}
-                    )
-                except Exception as e:
-                    weather_data_list.append(
-                        {"city": city, "error": f"Unexpected error: {str(e)}"}
-                    )
+            weather_data_list = _weather_for_city_list(cities)
 
             return JsonResponse(weather_data_list, safe=False)
 
@@ -203,19 +335,21 @@ def full_weather_report(request):
             if not city:
                 return JsonResponse({"error": "City not provided"}, status=400)
 
-            url = f"{os.environ.get('BASE_URL')}?q={city}&appid={os.environ.get('API_KEY')}"
-            source = urllib.request.urlopen(url).read()
-            list_of_data = json.loads(source)
+            list_of_data = weather_cache.get(city, weather_client.fetch_city)
 
             return JsonResponse(list_of_data)
 
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON"}, status=400)
-        except urllib.error.HTTPError as e:
+        except UpstreamHTTPError as e:
             return JsonResponse(
                 {"error": f"API request failed: {e.code} {e.reason}"}, status=502
             )
-        except urllib.error.URLError as e:
+        except UpstreamUnavailable as e:
+            return JsonResponse(
+                {"error": f"{UPSTREAM_UNAVAILABLE_ERROR}: {e.reason}"}, status=503
+            )
+        except UpstreamNetworkError as e:
             return JsonResponse({"error": f"Network error: {e.reason}"}, status=503)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
@@ -223,6 +357,43 @@ def full_weather_report(request):
     return JsonResponse({"error": "Only POST method allowed"}, status=405)
 
 
+def _update_rollups():
+    """
+    Folds newly ingested reports into the rollups. A failure here leaves the
+    reports saved; the rollup_weather command picks them up later.
+    """
+    if not settings.WEATHER_ROLLUP_ON_INGEST:
+        return
+    try:
+        catch_up()
+    except Exception:
+        logger.exception("Updating weather rollups failed")
+
+
+def _full_report_from_payload(data):
+    """
+    Builds an unsaved FullWeatherReport from an OpenWeather payload.
+    """
+    sys = data.get("sys") if isinstance(data.get("sys"), dict) else {}
+    report = FullWeatherReport(
+        city_name=data.get("name"),
+        country=sys.get("country"),
+        coord=data.get("coord"),
+        weather=data.get("weather"),
+        main=data.get("main"),
+        wind=data.get("wind"),
+        clouds=data.get("clouds"),
+        sys=data.get("sys"),
+        base=data.get("base"),
+        visibility=data.get("visibility"),
+        dt=data.get("dt"),
+        timezone=data.get("timezone"),
+        cod=data.get("cod"),
+    )
+    report.fill_measurements()
+    return report
+
+
 @csrf_exempt
 def save_full_weather_report(request):
     if request.method == "POST":
@@ -230,22 +401,9 @@ def save_full_weather_report(request):
             # Parse the incoming JSON body
             data = json.loads(request.body)
 
-            # Create a new WeatherReport entry in the database
-            FullWeatherReport.objects.create(
-                city_name=data.get("name"),
-                country=data.get("sys", {}).get("country"),
-                coord=data.get("coord"),
-                weather=data.get("weather"),
-                main=data.get("main"),
-                wind=data.get("wind"),
-                clouds=data.get("clouds"),
-                sys=data.get("sys"),
-                base=data.get("base"),
-                visibility=data.get("visibility"),
-                dt=data.get("dt"),
-                timezone=data.get("timezone"),
-                cod=data.get("cod"),
-            )
+            # Store the report, replacing an earlier copy of the same observation
+            upsert_full_reports([_validated_full_report(data)])
+            _update_rollups()
 
             # Return success response
             return JsonResponse({"status": "success"}, status=201)
@@ -256,8 +414,112 @@ def save_full_weather_report(request):
     return JsonResponse({"error": "Only POST method allowed"}, status=405)
 
 
+def _iter_bulk_records(request):
+    """
+    Yields (index, record) pairs from a JSON array body, or from an NDJSON
+    body read line by line off the request stream. A line that is not
+    valid JSON is yielded as its decoding error instead.
+    """
+    if request.content_type == "application/json":
+        records = json.load(request)
+        if not isinstance(records, list):
+            raise ValueError("Expected a JSON array of reports")
+        yield from enumerate(records)
+        return
+
+    index = 0
+    for line in request:
+        if not line.strip():
+            continue
+        try:
+            yield index, json.loads(line)
+        except ValueError as e:
+            yield index, e
+        index += 1
+
+
+def _validated_full_report(record, horizon=0):
+    if isinstance(record, Exception):
+        raise ValidationError(f"Invalid JSON: {record}")
+    if not isinstance(record, dict):
+        raise ValidationError("Report must be a JSON object")
+    report = _full_report_from_payload(record)
+    report.full_clean(validate_unique=False, validate_constraints=False)
+    if report.dt < horizon:
+        raise ValidationError(
+            f"Report is older than the retained history (dt < {horizon})"
+        )
+    return report
+
+
+@csrf_exempt
+def save_full_weather_reports_bulk(request):
+    """
+    Ingests many reports in one request.
+    Accepts NDJSON (one OpenWeather payload per line) or, with
+    Content-Type: application/json, a JSON array of payloads. Valid
+    reports are upserted in batches in a single transaction, so resending
+    an observation (same city and dt) overwrites it; invalid ones are
+    skipped and listed in the response by their index.
+    """
+    if request.method == "POST":
+        batch_size = settings.WEATHER_BULK_BATCH_SIZE
+        created = 0
+        errors = []
+        batch = []
+
+        try:
+            with transaction.atomic():
+                # Older reports were compacted into the rollups; see
+                # upsert_full_reports().
+                horizon = compacted_before()
+                for index, record in _iter_bulk_records(request):
+                    try:
+                        batch.append(_validated_full_report(record, horizon))
+                    except ValidationError as e:
+                        errors.append(
+                            {
+                                "index": index,
+                                "error": (
+                                    e.message_dict
+                                    if hasattr(e, "error_dict")
+                                    else e.messages
+                                ),
+                            }
+                        )
+                        continue
+                    except Exception as e:
+                        # One malformed record must not fail the others.
+                        errors.append({"index": index, "error": [str(e)]})
+                        continue
+
+                    if len(batch) >= batch_size:
+                        created += upsert_full_reports(batch)
+                        batch = []
+
+                if batch:
+                    created += upsert_full_reports(batch)
+
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        if created:
+            _update_rollups()
+        return JsonResponse(
+            {"created": created, "failed": len(errors), "errors": errors},
+            status=201 if created else 400,
+        )
+
+    return JsonResponse({"error": "Only POST method allowed"}, status=405)
+
+
 @csrf_exempt
 def save_essential_weather_report(request):
+    """
+    Saves one essential report. With WEATHER_WRITE_BEHIND enabled the report
+    is validated, queued for a batched write and acknowledged with 202;
+    a full queue is answered with 503 and Retry-After.
+    """
     if request.method == "POST":
         try:
             # Parse the incoming JSON body
@@ -266,15 +528,28 @@ def save_essential_weather_report(request):
                 [data.get("coordinate"), data.get("country_code"), data.get("temp")]
             ):
                 return JsonResponse({"error": "Missing required fields"}, status=400)
-            print(data)
-            # Create a new EssentialWeatherReport entry in the database
-            EssentialWeatherReport.objects.create(
+
+            report = EssentialWeatherReport(
                 coordinate=data.get("coordinate"),
                 country_code=data.get("country_code"),
                 humidity=data.get("humidity"),
                 pressure=data.get("pressure"),
                 temp=data.get("temp"),
             )
+            report.fill_typed_fields()
+
+            if settings.WEATHER_WRITE_BEHIND:
+                report.full_clean()
+                if not get_buffer(EssentialWeatherReport).submit(report):
+                    response = JsonResponse(
+                        {"error": "Too many pending writes, retry later"}, status=503
+                    )
+                    response["Retry-After"] = "1"
+                    return response
+                return JsonResponse({"status": "accepted"}, status=202)
+
+            # Create a new EssentialWeatherReport entry in the database
+            report.save()
 
             # Return success response
             return JsonResponse({"status": "success"}, status=201)
@@ -285,56 +560,227 @@ def save_essential_weather_report(request):
     return JsonResponse({"error": "Only POST method allowed"}, status=405)
 
 
+ESSENTIAL_REPORT_FIELDS = ("coordinate", "country_code", "humidity", "pressure", "temp")
+
+FULL_REPORT_FIELDS = (
+    "city_name",
+    "country",
+    "coord",
+    "weather",
+    "main",
+    "wind",
+    "clouds",
+    "sys",
+    "base",
+    "visibility",
+    "dt",
+    "timezone",
+    "cod",
+    "created_at",
+)
+
+
+def _filter_full_reports(reports, params):
+    if params.get("city"):
+        reports = reports.filter(city_name__iexact=params["city"])
+    if params.get("since"):
+        reports = reports.filter(
+            created_at__gte=parse_timestamp(params["since"], "since")
+        )
+    if params.get("until"):
+        reports = reports.filter(
+            created_at__lt=parse_timestamp(params["until"], "until")
+        )
+    return reports
+
+
+def _filter_essential_reports(reports, params):
+    if params.get("country"):
+        reports = reports.filter(country_code__iexact=params["country"])
+
+    if params.get("bbox"):
+        try:
+            min_lon, min_lat, max_lon, max_lat = (
+                float(part) for part in params["bbox"].split(",")
+            )
+        except ValueError:
+            raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        reports = reports.filter(
+            lat__gte=min_lat, lat__lte=max_lat, lon__gte=min_lon, lon__lte=max_lon
+        )
+
+    for name, lookup in (("temp_min", "temp_c__gte"), ("temp_max", "temp_c__lte")):
+        if params.get(name):
+            try:
+                reports = reports.filter(**{lookup: float(params[name])})
+            except ValueError:
+                raise ValueError(f"{name} must be a number")
+    return reports
+
+
+def _table_state(request, model, *timestamp_fields):
+    """
+    Row count, highest id and latest timestamps of `model`, computed with one
+    aggregate query and memoized on the request. Rows are added, deleted or
+    (full reports) upserted with a fresh updated_at, so this changes
+    whenever any list response would.
+    """
+    attr = f"_{model._meta.model_name}_state"
+    if not hasattr(request, attr):
+        aggregates = _table_state_aggregates(*timestamp_fields)
+        setattr(request, attr, model.objects.aggregate(**aggregates))
+    return getattr(request, attr)
+
+
+def _table_state_aggregates(*timestamp_fields):
+    aggregates = {"count": Count("id"), "last_id": Max("id")}
+    aggregates.update({name: Max(name) for name in timestamp_fields})
+    return aggregates
+
+
+def _essential_state_etag(state):
+    return f"essential-{state['count']}-{state['last_id']}"
+
+
+def _full_state_etag(state):
+    updated = state["updated_at"].timestamp() if state["updated_at"] else 0
+    return f"full-{state['count']}-{state['last_id']}-{updated}"
+
+
+def _essential_reports_etag(request):
+    return _essential_state_etag(_table_state(request, EssentialWeatherReport))
+
+
+def _full_reports_etag(request):
+    return _full_state_etag(_table_state(request, FullWeatherReport, "updated_at"))
+
+
+def _full_reports_last_modified(request):
+    return _table_state(request, FullWeatherReport, "updated_at")["updated_at"]
+
+
+@condition(etag_func=_essential_reports_etag)
 def get_essential_weather_reports(request):
+    """
+    Lists essential reports, optionally filtered with ?country=GB, a
+    bounding box ?bbox=min_lon,min_lat,max_lon,max_lat and a Celsius range
+    ?temp_min=/&temp_max=. Supports ?limit=/&cursor= keyset pages and
+    ?stream=1 (see list_response).
+    """
     if request.method == "GET":
-        # Retrieve all weather reports from the database
-        reports = EssentialWeatherReport.objects.all()
-
-        # Prepare the response data by converting the queryset to a list of dictionaries
-        report_data = []
-        for report in reports:
-            report_data.append(
-                {
-                    "coordinate": report.coordinate,
-                    "country_code": report.country_code,
-                    "humidity": report.humidity,
-                    "pressure": report.pressure,
-                    "temp": report.temp,
-                }
+        try:
+            reports = _filter_essential_reports(
+                EssentialWeatherReport.objects.all(), request.GET
             )
-
-        # Return the data as JSON
-        return JsonResponse(report_data, safe=False)
+            return list_response(
+                request,
+                reports,
+                ESSENTIAL_REPORT_FIELDS,
+                ordering=("id",),
+                max_page_size=settings.WEATHER_PAGE_MAX_SIZE,
+            )
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
     return JsonResponse({"error": "Only GET method allowed"}, status=405)
 
 
+@condition(etag_func=_full_reports_etag, last_modified_func=_full_reports_last_modified)
 def get_full_weather_report(request):
+    """
+    Lists full reports, optionally filtered with ?city=London and a
+    created_at range ?since=/&until= (ISO 8601). Supports ?limit=/&cursor=
+    keyset pages and ?stream=1 (see list_response).
+    """
+    if request.method == "GET":
+        try:
+            reports = _filter_full_reports(FullWeatherReport.objects.all(), request.GET)
+            return list_response(
+                request,
+                reports,
+                FULL_REPORT_FIELDS,
+                ordering=("created_at", "id"),
+                max_page_size=settings.WEATHER_PAGE_MAX_SIZE,
+            )
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"error": "Only GET method allowed"}, status=405)
+
+
+HISTORY_FIELDS = ("dt", "temp", "pressure", "humidity", "wind_speed")
+
+
+def full_weather_history(request):
+    """
+    Time series for one city from the indexed measurement columns.
+    Expects ?city=London and optionally ?start=/&end= as Unix timestamps
+    (matched against the upstream `dt`, end exclusive).
+    """
+    if request.method == "GET":
+        city = request.GET.get("city")
+        if not city:
+            return JsonResponse({"error": "City not provided"}, status=400)
+
+        points = FullWeatherReport.objects.filter(city_name=city)
+        try:
+            if request.GET.get("start"):
+                points = points.filter(dt__gte=int(request.GET["start"]))
+            if request.GET.get("end"):
+                points = points.filter(dt__lt=int(request.GET["end"]))
+        except ValueError:
+            return JsonResponse(
+                {"error": "start and end must be Unix timestamps"}, status=400
+            )
+
+        return JsonResponse(
+            {
+                "city": city,
+                "points": list(points.order_by("dt").values(*HISTORY_FIELDS)),
+            }
+        )
+    return JsonResponse({"error": "Only GET method allowed"}, status=405)
+
+
+def weather_aggregates(request):
+    """
+    Precomputed min/max/mean/count per bucket for one city.
+    Expects ?city=London, optional ?period=hour|day (default hour) and
+    ?start=/&end= Unix timestamps bounding the bucket start (end exclusive).
+    """
     if request.method == "GET":
-        # Retrieve all full weather reports from the database
-        reports = FullWeatherReport.objects.all()
-
-        # Prepare the response data by converting the queryset to a list of dictionaries
-        report_data = []
-        for report in reports:
-            report_data.append(
-                {
-                    "city_name": report.city_name,
-                    "country": report.country,
-                    "coord": report.coord,  # Coordinate stored as a JSON field
-                    "weather": report.weather,  # Weather stored as a JSON field
-                    "main": report.main,  # Main data stored as a JSON field
-                    "wind": report.wind,  # Wind data stored as a JSON field
-                    "clouds": report.clouds,  # Clouds data stored as a JSON field
-                    "sys": report.sys,  # System data stored as a JSON field
-                    "base": report.base,
-                    "visibility": report.visibility,
-                    "dt": report.dt,
-                    "timezone": report.timezone,
-                    "cod": report.cod,
-                    "created_at": report.created_at,
-                }
+        city = request.GET.get("city")
+        if not city:
+            return JsonResponse({"error": "City not provided"}, status=400)
+        period = request.GET.get("period", WeatherRollup.HOUR)
+        if period not in PERIOD_SECONDS:
+            return JsonResponse(
+                {"error": f"period must be one of {', '.join(PERIOD_SECONDS)}"},
+                status=400,
             )
 
-        # Return the data as JSON
-        return JsonResponse(report_data, safe=False)
+        buckets = WeatherRollup.objects.filter(city_name=city, period=period)
+        try:
+            if request.GET.get("start"):
+                buckets = buckets.filter(bucket_start__gte=int(request.GET["start"]))
+            if request.GET.get("end"):
+                buckets = buckets.filter(bucket_start__lt=int(request.GET["end"]))
+        except ValueError:
+            return JsonResponse(
+                {"error": "start and end must be Unix timestamps"}, status=400
+            )
+
+        return JsonResponse(
+            {
+                "city": city,
+                "period": period,
+                "buckets": [summarize(b) for b in buckets.order_by("bucket_start")],
+            }
+        )
+    return JsonResponse({"error": "Only GET method allowed"}, status=405)
+
+
+def weather_cache_stats(request):
+    if request.method == "GET":
+        return JsonResponse(
+            {**weather_cache.stats(), "circuit": weather_client.breaker.state}
+        )
     return JsonResponse({"error": "Only GET method allowed"}, status=405)
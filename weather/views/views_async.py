@@ -0,0 +1,320 @@
+import asyncio
+import json
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from ..cache import weather_cache
+from ..client import (
+    UpstreamHTTPError,
+    UpstreamNetworkError,
+    UpstreamUnavailable,
+    async_weather_client,
+)
+from ..models import EssentialWeatherReport, FullWeatherReport, upsert_full_reports
+from ..writebehind import get_buffer
+from .pagination import alist_response
+from .views import (
+    ESSENTIAL_REPORT_FIELDS,
+    FANOUT_TIMEOUT_ERROR,
+    FULL_REPORT_FIELDS,
+    INVALID_CITY_ERROR,
+    UPSTREAM_UNAVAILABLE_ERROR,
+    SSE,
+    SSE_DONE_EVENT,
+    _city_entry_from_payload,
+    _city_error_entry,
+    _city_stream_format,
+    _city_stream_response,
+    _encode_city_event,
+    _essential_from_payload,
+    _essential_state_etag,
+    _filter_essential_reports,
+    _filter_full_reports,
+    _full_state_etag,
+    _is_valid_city,
+    _table_state_aggregates,
+    _update_rollups,
+    _validated_full_report,
+)
+
+# Async versions of the JSON endpoints, served under async/ in weather/urls.py.
+# Under ASGI they wait on the upstream with httpx and on the database with the
+# async ORM instead of holding a worker thread. Responses match the sync views.
+
+
+async def _fetch_city(city):
+    return await weather_cache.aget(city, async_weather_client.fetch_city)
+
+
+@csrf_exempt
+async def index(request):
+    if request.method == "POST":
+        try:
+            body_data = json.loads(request.body.decode("utf-8"))
+            city = body_data.get("city")
+
+            if not city:
+                return JsonResponse({"error": "City not provided"}, status=400)
+
+            return JsonResponse(_essential_from_payload(await _fetch_city(city)))
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=500)
+
+    return JsonResponse({"error": "Only POST method allowed"}, status=405)
+
+
+async def _city_weather_entry(city, semaphore):
+    if not _is_valid_city(city):
+        return {"city": city, "error": INVALID_CITY_ERROR}
+
+    async with semaphore:
+        try:
+            return _city_entry_from_payload(city, await _fetch_city(city))
+        except Exception as e:
+            return _city_error_entry(city, e)
+
+
+async def _iter_weather_for_city_list(cities):
+    """
+    Looks up every city concurrently, at most WEATHER_FANOUT_WORKERS at a
+    time, and yields (position in `cities`, entry) as each lookup finishes.
+    Lookups still running at the deadline are cancelled and yielded last
+    as timeouts.
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.WEATHER_FANOUT_WORKERS))
+    tasks = {
+        asyncio.ensure_future(_city_weather_entry(city, semaphore)): index
+        for index, city in enumerate(cities)
+    }
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.WEATHER_FANOUT_DEADLINE
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=max(0, deadline - loop.time()),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for task in sorted(done, key=tasks.get):
+                yield tasks[task], task.result()
+        for index in sorted(tasks[task] for task in pending):
+            yield index, {"city": cities[index], "error": FANOUT_TIMEOUT_ERROR}
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _weather_for_city_list(cities):
+    entries = [None] * len(cities)
+    async for index, entry in _iter_weather_for_city_list(cities):
+        entries[index] = entry
+    return entries
+
+
+async def _stream_weather_for_city_list(stream_format, cities):
+    async for index, entry in _iter_weather_for_city_list(cities):
+        yield _encode_city_event(stream_format, index, entry)
+    if stream_format == SSE:
+        yield SSE_DONE_EVENT
+
+
+@csrf_exempt
+async def weather_for_cities(request):
+    """
+    Async weather_for_cities: {"cities": [...]} in, one entry per city out.
+    Supports the same ?stream=ndjson|sse modes as the sync view.
+    """
+    if request.method == "POST":
+        try:
+            body_data = json.loads(request.body.decode("utf-8"))
+
+            cities = body_data.get("cities")
+            if not cities or not isinstance(cities, list):
+                return JsonResponse(
+                    {"error": "City list not provided or not in correct format"},
+                    status=400,
+                )
+
+            stream_format = _city_stream_format(request)
+            if stream_format:
+                return _city_stream_response(
+                    stream_format, _stream_weather_for_city_list(stream_format, cities)
+                )
+
+            return JsonResponse(await _weather_for_city_list(cities), safe=False)
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON in request body"}, status=400)
+        except Exception as e:
+            return JsonResponse({"error": f"Overall error: {str(e)}"}, status=500)
+
+    return JsonResponse({"error": "Only POST method allowed"}, status=405)
+
+
+@csrf_exempt
+async def full_weather_report(request):
+    if request.method == "POST":
+        try:
+            body_data = json.loads(request.body.decode("utf-8"))
+            city = body_data.get("city")
+
+            if not city:
+                return JsonResponse({"error": "City not provided"}, status=400)
+
+            return JsonResponse(await _fetch_city(city))
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        except UpstreamHTTPError as e:
+            return JsonResponse(
+                {"error": f"API request failed: {e.code} {e.reason}"}, status=502
+            )
+        except UpstreamUnavailable as e:
+            return JsonResponse(
+                {"error": f"{UPSTREAM_UNAVAILABLE_ERROR}: {e.reason}"}, status=503
+            )
+        except UpstreamNetworkError as e:
+            return JsonResponse({"error": f"Network error: {e.reason}"}, status=503)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=500)
+
+    return JsonResponse({"error": "Only POST method allowed"}, status=405)
+
+
+@csrf_exempt
+async def save_full_weather_report(request):
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+
+            report = _validated_full_report(data)
+            await sync_to_async(upsert_full_reports)([report])
+            await sync_to_async(_update_rollups)()
+
+            return JsonResponse({"status": "success"}, status=201)
+
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"error": "Only POST method allowed"}, status=405)
+
+
+@csrf_exempt
+async def save_essential_weather_report(request):
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            if not all(
+                [data.get("coordinate"), data.get("country_code"), data.get("temp")]
+            ):
+                return JsonResponse({"error": "Missing required fields"}, status=400)
+
+            report = EssentialWeatherReport(
+                coordinate=data.get("coordinate"),
+                country_code=data.get("country_code"),
+                humidity=data.get("humidity"),
+                pressure=data.get("pressure"),
+                temp=data.get("temp"),
+            )
+            report.fill_typed_fields()
+
+            if settings.WEATHER_WRITE_BEHIND:
+                await sync_to_async(report.full_clean)()
+                if not get_buffer(EssentialWeatherReport).submit(report):
+                    response = JsonResponse(
+                        {"error": "Too many pending writes, retry later"}, status=503
+                    )
+                    response["Retry-After"] = "1"
+                    return response
+                return JsonResponse({"status": "accepted"}, status=202)
+
+            await report.asave()
+
+            return JsonResponse({"status": "success"}, status=201)
+
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"error": "Only POST method allowed"}, status=405)
+
+
+def _acondition(model, make_etag, last_modified_field=None):
+    """
+    django.views.decorators.http.condition() for async views, whose
+    validators cannot use the sync ORM: the ETag (and Last-Modified, from
+    `last_modified_field`) come from one aaggregate() over `model`, like
+    the sync list views' _table_state().
+    """
+    timestamp_fields = (last_modified_field,) if last_modified_field else ()
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            state = await model.objects.aaggregate(
+                **_table_state_aggregates(*timestamp_fields)
+            )
+            etag = quote_etag(make_etag(state))
+            last_modified = None
+            if last_modified_field and state[last_modified_field]:
+                last_modified = int(state[last_modified_field].timestamp())
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                if last_modified and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(last_modified)
+                response.headers.setdefault("ETag", etag)
+            return response
+
+        return inner
+
+    return decorator
+
+
+@_acondition(EssentialWeatherReport, _essential_state_etag)
+async def get_essential_weather_reports(request):
+    if request.method == "GET":
+        try:
+            reports = _filter_essential_reports(
+                EssentialWeatherReport.objects.all(), request.GET
+            )
+            return await alist_response(
+                request,
+                reports,
+                ESSENTIAL_REPORT_FIELDS,
+                ordering=("id",),
+                max_page_size=settings.WEATHER_PAGE_MAX_SIZE,
+            )
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"error": "Only GET method allowed"}, status=405)
+
+
+@_acondition(FullWeatherReport, _full_state_etag, last_modified_field="updated_at")
+async def get_full_weather_report(request):
+    if request.method == "GET":
+        try:
+            reports = _filter_full_reports(FullWeatherReport.objects.all(), request.GET)
+            return await alist_response(
+                request,
+                reports,
+                FULL_REPORT_FIELDS,
+                ordering=("created_at", "id"),
+                max_page_size=settings.WEATHER_PAGE_MAX_SIZE,
+            )
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"error": "Only GET method allowed"}, status=405)
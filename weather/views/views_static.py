@@ -1,5 +1,7 @@
 from django.http import JsonResponse
 
+STATIC_CITIES = ["London", "Tokyo", "madurai", "chennai"]
+
 
 def get_cities(request):
-    return JsonResponse({"cities": ["London", "Tokyo", "madurai", "chennai"]})
+    return JsonResponse({"cities": STATIC_CITIES})
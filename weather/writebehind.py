@@ -0,0 +1,132 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Bounded in-memory queue of unsaved model instances, written to the
+    database in batches by a background thread.
+
+    A batch is flushed once it holds `batch_size` rows or `flush_interval`
+    seconds after its first row arrived, whichever comes first. submit()
+    never blocks: it returns False when the queue is full so the caller can
+    push back on the client. close() drains whatever is left.
+    """
+
+    def __init__(self, model, max_size, batch_size, flush_interval):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"write-behind-{self.model.__name__}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def submit(self, instance):
+        try:
+            self._queue.put_nowait(instance)
+        except queue.Full:
+            return False
+        return True
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """
+        Writes everything currently queued. Returns the number of rows saved.
+        """
+        saved = 0
+        while True:
+            batch = self._take(self.batch_size)
+            if not batch:
+                return saved
+            saved += self._write(batch)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _take(self, limit, timeout=None):
+        batch = []
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(batch) < limit:
+            try:
+                if deadline is None:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            self.model.objects.bulk_create(batch)
+            return len(batch)
+        except Exception:
+            logger.exception("Write-behind batch failed, retrying row by row")
+
+        saved = 0
+        for instance in batch:
+            try:
+                instance.save()
+                saved += 1
+            except Exception:
+                logger.exception("Dropping unsaveable %s", self.model.__name__)
+        return saved
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first] + self._take(self.batch_size - 1, self.flush_interval)
+            self._write(batch)
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(model):
+    """
+    Returns the process-wide write-behind buffer for `model`, starting it
+    (and registering its shutdown flush) on first use.
+    """
+    with _buffers_lock:
+        buffer = _buffers.get(model)
+        if buffer is None:
+            buffer = _buffers[model] = WriteBehindBuffer(
+                model,
+                max_size=settings.WEATHER_WRITE_BEHIND_QUEUE_SIZE,
+                batch_size=settings.WEATHER_WRITE_BEHIND_BATCH_SIZE,
+                flush_interval=settings.WEATHER_WRITE_BEHIND_INTERVAL,
+            )
+            buffer.start()
+            atexit.register(buffer.close)
+        return buffer